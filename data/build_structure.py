@@ -1,13 +1,27 @@
 #!/usr/bin/env python3
 import sys
 import json
+from collections import defaultdict
+import functools
+import math
 import base64
 from datetime import datetime, timedelta
-import locale
+import numpy as np
 
 DATA_DIR = "/data"
 slide_info = ["resumen", "sugerencia", "sugerencia_version"]
 
+# Plantilla de contenido que usa cada producto
+_FILE_SLIDE = {
+    "uas": "plantilla_contenido.pptx",
+    "wazuh": "plantilla_contenido_no_kpis.pptx",
+    "ardid": "plantilla_contenido.pptx",
+    "invgate.asj": "plantilla_contenido_no_kpis.pptx",
+    "invgate": "plantilla_contenido.pptx",
+    "beyondtrust": "plantilla_contenido.pptx",
+    "whalemate": "plantilla_contenido.pptx",
+}
+
 
 MESES_ES = {
     1: "Enero",
@@ -30,19 +44,43 @@ def formatea_mes_anio_es(dt: datetime) -> str:
     return f"{MESES_ES.get(dt.month, 'Mes')} {dt.year}"
 
 
-def chart(values, name, build, kpis):
-    total = 0
-    for v in values:
-        count = sum(values[v])
-        total += count
+@functools.lru_cache(maxsize=32)
+def _load_chart_config(product: str) -> dict:
+    """Lee (una sola vez por producto) la definición de gráficos chart_<product>.json."""
+    with open(f"{DATA_DIR}/charts/chart_{product}.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _to_int(val):
+    """Convierte un valor de la planilla a int; lo que no sea numérico cuenta como 0."""
+    # Camino rápido: los números del JSON ya llegan como int/float
+    if type(val) is int:
+        return val
+    if type(val) is float and math.isfinite(val):
+        return int(val)
+    try:
+        return int(float(val))
+    except (ValueError, TypeError):
+        return 0
+
+
+def chart(values, series, name, build, kpis):
+    """
+    `values` es una matriz (semanas × series) con los datos del gráfico y
+    `series` los nombres de sus columnas.
+    """
+    totals = values.sum(axis=0)
+    for serie, count in zip(series, totals.tolist()):
         if count > 0:
-            kpis[v] = count
+            kpis[serie] = count
 
-    if total > 0:
+    if totals.sum() > 0:
         build["charts"][name] = {
             "type": "bar",
             "labels": ["Semana 1", "Semana2", "Semana 3", "Semana 4"],
-            **values,
+            **dict(zip(series, values.T.tolist())),
+            # Orden de las series: el renderer no tiene que volver a detectarlas
+            "_series_order": list(series),
         }
 
 
@@ -52,9 +90,10 @@ def build_slide(product, product_name, chart_definitions, pointer_resume):
         "kpis": "",
         "charts": {},
     }
-    # 2. Inicializamos dinámicamente los contenedores para los datos de los gráficos.
+    # 2. Preasignamos una matriz (semanas × series) por gráfico; las filas de
+    # resumen/sugerencias no cuentan, así que len(product) alcanza como cota.
     chart_data = {
-        chart_name: {serie: [] for serie in series}
+        chart_name: np.zeros((len(product), len(series)), dtype=np.int64)
         for chart_name, series in chart_definitions.items()
     }
     # También creamos un mapa plano de todas las series para facilitar la búsqueda.
@@ -66,6 +105,7 @@ def build_slide(product, product_name, chart_definitions, pointer_resume):
     kpis = {}
 
     # 3. Procesamos los datos en un único bucle optimizado.
+    n_semanas = 0
     for semana in product:
         semana_key = semana.get("Semana", "").strip()
         if semana_key in slide_info:
@@ -75,22 +115,25 @@ def build_slide(product, product_name, chart_definitions, pointer_resume):
                 break
         else:
             for chart_name, series_def in chart_definitions.items():
-                for serie_name, json_key in series_def.items():
-                    val = semana.get(json_key, 0)
-                    try:
-                        val = int(float(val))
-                    except (ValueError, TypeError):
-                        val = 0
-                    chart_data[chart_name][serie_name].append(val)
+                row = chart_data[chart_name][n_semanas]
+                for s_idx, json_key in enumerate(series_def.values()):
+                    row[s_idx] = _to_int(semana.get(json_key, 0))
+            n_semanas += 1
 
     # 4. Generamos los gráficos y los KPIs a partir de los datos recolectados.
     for chart_name, data in chart_data.items():
-        chart(data, chart_name, build, kpis)
+        chart(
+            data[:n_semanas],
+            list(chart_definitions[chart_name]),
+            chart_name,
+            build,
+            kpis,
+        )
 
-    # 5. Construimos la cadena de KPIs.
-    for serie, total in kpis.items():
-        nombre_amigable = all_series.get(serie, serie)
-        build["kpis"] += f"{nombre_amigable}: {total}\n"
+    # 5. Construimos la cadena de KPIs (una línea por serie).
+    build["kpis"] = "".join(
+        f"{all_series.get(serie, serie)}: {total}\n" for serie, total in kpis.items()
+    )
 
     return build
 
@@ -151,41 +194,27 @@ def main():
     else:
         main["fecha_portada"] = "Fecha no válida"
 
-    parse_products = {}
+    parse_products = defaultdict(list)
     actual_product = ""
     # separo productos { "uas": product_data[] }
     for product in products:
         actual_product = product.get("product", actual_product)
-        if actual_product not in parse_products:
-            parse_products[actual_product] = []
         parse_products[actual_product].append(product)
 
     # agrego contenidos slide
     for product in parse_products:
         pointer_resumen = list(parse_products[product][0].keys())[1]
-        with open(
-            f"{DATA_DIR}/charts/chart_{product}.json", "r", encoding="utf-8"
-        ) as chart_file:
-            chart = json.load(chart_file)
+        chart = _load_chart_config(product)
 
         slide_data = build_slide(
             parse_products[product], product, chart, pointer_resumen
         )
-        file_slide = {
-            "uas": "plantilla_contenido.pptx",
-            "wazuh": "plantilla_contenido_no_kpis.pptx",
-            "ardid": "plantilla_contenido.pptx",
-            "invgate.asj": "plantilla_contenido_no_kpis.pptx",
-            "invgate": "plantilla_contenido.pptx",
-            "beyondtrust": "plantilla_contenido.pptx",
-            "whalemate": "plantilla_contenido.pptx",
-        }
         if slide_data:
             main["slides"].append(
                 {
                     "type": product,
                     "slide": slide_data,
-                    "file_slide": file_slide[product],
+                    "file_slide": _FILE_SLIDE.get(product, "plantilla_contenido.pptx"),
                 }
             )
 
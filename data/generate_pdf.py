@@ -1,22 +1,32 @@
 #!/usr/bin/env python3
 import sys
 import json
+import functools
+import math
 import base64
 import subprocess
 import os
+import threading
 import warnings
 import uuid
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
 from pptx import Presentation
 from pptx.util import Inches, Pt
-import matplotlib.pyplot as plt
-from pypdf import PdfReader, PdfWriter
+import pikepdf
+from PIL import Image, ImageDraw, ImageFont
 import requests
 import textwrap
-import numpy as np
 from io import BytesIO
 
 warnings.filterwarnings("ignore")
 DATA_DIR = "/data"
+# Los PDF intermedios solo viven durante la ejecución: van a /tmp (tmpfs),
+# el único resultado persistente es el informe final en {DATA_DIR}/generados.
+PDF_PARTS_DIR = "/tmp/pdf-parts"
+# Máximo de LibreOffice convirtiendo a la vez. El pod de n8n tiene 1 CPU y
+# 1 GiB compartidos con n8n: por defecto un solo soffice convierte todo el lote.
+LO_MAX_WORKERS = max(1, int(os.environ.get("LO_MAX_WORKERS", "1")))
 
 
 # --------------------------------------------------------------
@@ -41,26 +51,24 @@ def replace_placeholders(slide, replacements):
     """
     Busca un placeholder por su nombre (definido en el Panel de Selección de PowerPoint)
     y reemplaza su texto por el valor correspondiente.
+    Recorre las formas una sola vez y resuelve cada texto con una búsqueda en el dict.
     """
 
-    for key, value in replacements.items():
-        for shape in slide.shapes:
-            if shape.has_text_frame:
-                texto = shape.text.strip()
-                if texto == key:
-                    # Asegurar que el valor es string
-                    if not isinstance(value, str):
-                        val_str = str(value)
-                    else:
-                        val_str = value
+    def normalizar(value):
+        # Asegurar que el valor es string
+        val_str = value if isinstance(value, str) else str(value)
+        # Reemplazar secuencias literales "\\n" por saltos de línea reales
+        # y también manejar escapes dobles si vienen.
+        return val_str.replace("\\n", "\n").replace("\\\n", "\n")
 
-                    # Reemplazar secuencias literales "\\n" por saltos de línea reales
-                    # y también manejar escapes dobles si vienen.
-                    val_str = val_str.replace("\\n", "\n")
-                    val_str = val_str.replace("\\\n", "\n")
-
-                    # Asignar al cuadro de texto
-                    shape.text = val_str
+    for shape in slide.shapes:
+        if not shape.has_text_frame:
+            continue
+        key = shape.text.strip()
+        if key not in replacements:
+            continue
+        # Asignar al cuadro de texto
+        shape.text = normalizar(replacements[key])
 
 
 def insert_image_scaled_by_width(slide, placeholder, image_path_or_stream):
@@ -126,6 +134,10 @@ def _insert_logo_with_scaling(slide, logo_stream):
     if not logo_stream:
         return
 
+    # El mismo stream (decodificado una sola vez en main) se reutiliza en
+    # portada, cada contenido y cierre: rebobinarlo antes de cada inserción.
+    logo_stream.seek(0)
+
     for shape in slide.placeholders:
         if shape.placeholder_format.type == LOGO_PLACEHOLDER_TYPE:
 
@@ -138,11 +150,13 @@ def log(msg):
 
 
 def set_placeholder_text(slide, idx, text):
-    for ph in slide.placeholders:
-        if ph.placeholder_format.idx == idx:
-            if ph.has_text_frame:
-                ph.text = text
-            return
+    # Indexar los placeholders por idx una sola vez por diapositiva
+    placeholders = {ph.placeholder_format.idx: ph for ph in slide.placeholders}
+    ph = placeholders.get(idx)
+    if ph is not None:
+        if ph.has_text_frame:
+            ph.text = text
+        return
     # Si no existe, opcionalmente crear un cuadro de texto
     tb = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(1))
     tf = tb.text_frame
@@ -177,146 +191,296 @@ def generar_portada(data, logo_stream):
 # --------------------------------------------------------------
 # GRÁFICOS
 # --------------------------------------------------------------
-def create_matplotlib_chart(chart_info, friendly_names, output_file):
-    plt.figure(figsize=(10, 5))
-    ctype = chart_info.get("type")
+CHART_SIZE = (1500, 750)  # 10x5 pulgadas a 150 dpi, igual que los gráficos matplotlib
+CHART_DPI = 150
+CHART_PALETTE = ["#4f81bd", "#9abb59", "#4bacc6", "#8064a2"]
+CHART_GRID_COLOR = "#dcdcdc"
+# Claves de un gráfico que no son series de datos
+CHART_META_KEYS = ("labels", "type", "title", "titulo", "_series_order")
 
-    # Título si viene en la definición del gráfico
-    title = chart_info.get("title") or chart_info.get("titulo") or ""
-    if title:
-        plt.title(title, fontsize=20, fontweight="bold", pad=20)
+# Protege la figura matplotlib compartida (ver _chart_figure)
+_FIG_LOCK = threading.Lock()
 
-    # Aumentar tamaño de fuente para los ejes
-    plt.xticks(fontsize=18)
-    plt.yticks(fontsize=18)
 
-    labels = chart_info.get("labels", [])
-    x = range(len(labels))
+@functools.lru_cache(maxsize=None)
+def _chart_font(size_pt, bold=False):
+    """Carga (una sola vez por proceso) la fuente DejaVu en el tamaño pedido."""
+    name = "DejaVuSans-Bold.ttf" if bold else "DejaVuSans.ttf"
+    try:
+        return ImageFont.truetype(name, round(size_pt * CHART_DPI / 72))
+    except OSError:
+        log(f"⚠️ No se encontró la fuente {name}, se usa la fuente por defecto.")
+        return ImageFont.load_default()
 
-    # Mapa de etiquetas amigables para claves comunes
-    flat_friendly_names = {
-        key: value for chart in friendly_names.values() for key, value in chart.items()
-    }
 
-    # Paleta de colores para series (se rotan si hay más series)
-    palette = ["#4f81bd", "#9abb59", "#4bacc6", "#8064a2"]
+def _nice_ticks(max_value, target=5):
+    """Marcas 'redondas' del eje Y (1, 2 o 5 × 10^n) que cubren max_value."""
+    if max_value <= 0:
+        return [0, 1]
+    raw_step = max_value / target
+    magnitude = 10 ** math.floor(math.log10(raw_step))
+    step = next(m * magnitude for m in (1, 2, 5, 10) if m * magnitude >= raw_step)
+    step = max(1, step)
+    return [i * step for i in range(math.ceil(max_value / step) + 1)]
 
-    # Detectar series numéricas dinámicamente (manteniendo el orden del dict)
-    series_keys = []
-    for key, val in chart_info.items():
-        if key in ("labels", "type", "title", "titulo"):
-            continue
-        # Considerar series que sean listas/tuplas de números
-        if isinstance(val, (list, tuple)) and all(
-            isinstance(v, (int, float)) for v in val
-        ):
-            series_keys.append(key)
-
-    if ctype == "bar":
-        # Barras agrupadas: calcular offsets según cantidad de series
-        n = len(series_keys)
-        if n == 0:
-            # nada que dibujar
-            return
-
-        ind = np.arange(len(labels))  # posiciones base
-        total_width = 0.7
-        bar_width = total_width / n
-
-        for idx, key in enumerate(series_keys):
-            vals = list(chart_info.get(key) or [])
-            # Normalizar longitud de vals para que coincida con las etiquetas
-            if len(vals) < len(labels):
-                vals = vals + [0] * (len(labels) - len(vals))
-            elif len(vals) > len(labels):
-                vals = vals[: len(labels)]
-
-            label_full = flat_friendly_names.get(
-                key, key.replace("_", " ").capitalize()
-            )
-            # Dividir etiquetas largas en varias líneas para que no encojan el gráfico
-            label = textwrap.fill(label_full, width=22)
-
-            color = palette[idx % len(palette)]
-
-            # calcular posiciones para esta serie
-            offset = (idx - (n - 1) / 2) * bar_width
-            positions = ind + offset
-            plt.bar(positions, vals, bar_width * 0.95, label=label, color=color)
-
-        # Ajustar ticks al centro de los grupos
-        plt.xticks(ind, labels, rotation=0, fontsize=16)
-        plt.grid(axis="y", linestyle="-", color="#dcdcdc", linewidth=0.8)
-        # Leyenda a la derecha, centrada verticalmente
-        plt.legend(
-            loc="center left",
-            bbox_to_anchor=(1, 0.5),
-            frameon=False,
-            labelspacing=1.2,
-            fontsize=18,
+
+def _series_keys(chart_info):
+    """
+    Series del gráfico, en orden. build_structure.py las declara en
+    `_series_order`; para gráficos sin esa clave se detectan las listas numéricas.
+    """
+    series_order = chart_info.get("_series_order")
+    if series_order:
+        return series_order
+    # Considerar series que sean listas/tuplas de números
+    return [
+        key
+        for key, val in chart_info.items()
+        if key not in CHART_META_KEYS
+        and isinstance(val, (list, tuple))
+        and all(isinstance(v, (int, float)) for v in val)
+    ]
+
+
+def render_bar_chart(labels, series, palette, title, output):
+    """
+    Dibuja un gráfico de barras agrupadas directamente con Pillow, con el mismo
+    aspecto que el de matplotlib: título, grilla horizontal, separador de miles
+    en el eje Y y leyenda a la derecha centrada verticalmente.
+    `series` es un dict {etiqueta de la leyenda: valores}; el PNG se escribe
+    en `output` (ruta o archivo abierto, p. ej. un BytesIO).
+    """
+    width, height = CHART_SIZE
+    img = Image.new("RGBA", CHART_SIZE, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+
+    title_font = _chart_font(20, bold=True)
+    xtick_font = _chart_font(16)
+    ytick_font = _chart_font(18)
+    legend_font = _chart_font(18)
+    pad = 20
+
+    # Eje Y: marcas redondas con separador de miles (y un 5% de margen arriba)
+    max_value = max((max(vals, default=0) for vals in series.values()), default=0)
+    ticks = _nice_ticks(max_value * 1.05)
+    tick_labels = [f"{int(t):,}" for t in ticks]
+    ytick_w = max(draw.textbbox((0, 0), t, font=ytick_font)[2] for t in tick_labels)
+
+    # Leyenda: cuadro de color + etiqueta (ya partida en varias líneas)
+    swatch = draw.textbbox((0, 0), "M", font=legend_font)[3]
+    legend_boxes = [
+        draw.multiline_textbbox((0, 0), label, font=legend_font) for label in series
+    ]
+    legend_w = max((b[2] for b in legend_boxes), default=0) + swatch * 2
+
+    title_h = draw.textbbox((0, 0), title, font=title_font)[3] if title else 0
+    xtick_h = draw.textbbox((0, 0), "Semana", font=xtick_font)[3]
+
+    # Área de dibujo
+    left = pad + ytick_w + pad
+    right = width - pad - legend_w - pad
+    top = pad + (title_h + pad * 2 if title else pad)
+    bottom = height - pad - xtick_h - pad
+
+    if title:
+        title_w = draw.textbbox((0, 0), title, font=title_font)[2]
+        draw.text(
+            ((left + right - title_w) // 2, pad), title, font=title_font, fill="black"
+        )
+
+    def y_px(value):
+        return bottom - (bottom - top) * value / ticks[-1]
+
+    # Grilla y etiquetas del eje Y
+    for tick, text in zip(ticks, tick_labels):
+        y = y_px(tick)
+        draw.line([(left, y), (right, y)], fill=CHART_GRID_COLOR, width=2)
+        box = draw.textbbox((0, 0), text, font=ytick_font)
+        draw.text(
+            (left - pad // 2 - box[2], y - box[3] / 2),
+            text,
+            font=ytick_font,
+            fill="black",
         )
 
-    elif ctype == "line":
-        for idx, key in enumerate(series_keys):
-            vals = list(chart_info.get(key) or [])
-            # Normalizar longitud de vals para que coincida con las etiquetas
-            if len(vals) < len(labels):
-                vals = vals + [None] * (len(labels) - len(vals))
-            elif len(vals) > len(labels):
-                vals = vals[: len(labels)]
-            label_full = flat_friendly_names.get(
-                key, key.replace("_", " ").capitalize()
+    # Barras agrupadas: mismas posiciones que `ind + offset` en matplotlib
+    n = len(series)
+    slot_w = (right - left) / max(len(labels), 1)
+    bar_w = 0.7 / n if n else 0
+    for idx, vals in enumerate(series.values()):
+        color = palette[idx % len(palette)]
+        offset = (idx - (n - 1) / 2) * bar_w
+        for pos, value in enumerate(vals[: len(labels)]):
+            if value <= 0:
+                continue
+            center = left + slot_w * (pos + 0.5 + offset)
+            half = slot_w * bar_w * 0.95 / 2
+            draw.rectangle(
+                [(center - half, y_px(value)), (center + half, bottom)], fill=color
             )
-            # Dividir etiquetas largas en varias líneas
-            label = textwrap.fill(label_full, width=22)
 
-            color = palette[idx % len(palette)]
-            plt.plot(x, vals, label=label, marker="o", color=color)
+    # Etiquetas del eje X centradas en cada grupo
+    for pos, text in enumerate(labels):
+        box = draw.textbbox((0, 0), text, font=xtick_font)
+        x = left + slot_w * (pos + 0.5) - box[2] / 2
+        draw.text((x, bottom + pad // 2), text, font=xtick_font, fill="black")
+
+    # Marco de los ejes
+    draw.rectangle([(left, top), (right, bottom)], outline="black", width=2)
+
+    # Leyenda a la derecha, centrada verticalmente respecto del área de dibujo
+    spacing = swatch * 1.2
+    legend_h = sum(b[3] for b in legend_boxes) + spacing * max(n - 1, 0)
+    y = (top + bottom - legend_h) / 2
+    x = right + pad
+    for idx, (label, box) in enumerate(zip(series, legend_boxes)):
+        color = palette[idx % len(palette)]
+        sy = y + (box[3] - swatch) / 2
+        draw.rectangle([(x, sy), (x + swatch, sy + swatch)], fill=color)
+        draw.multiline_text(
+            (x + swatch * 1.5, y), label, font=legend_font, fill="black"
+        )
+        y += box[3] + spacing
+
+    img.save(output, format="PNG")
 
-        plt.xticks(x, labels, rotation=45, fontsize=16)
-        plt.grid(axis="y", linestyle="-", color="#dcdcdc", linewidth=0.8)
-        plt.legend(loc="best", fontsize=18)
 
-    # Formato eje Y con separador de miles
-    try:
-        import matplotlib.ticker as mtick
+def create_chart(chart_info, flat_friendly_names):
+    """
+    Genera la imagen del gráfico en memoria y devuelve el PNG como BytesIO
+    (None si no hay nada que dibujar). Las barras se dibujan con Pillow y el
+    resto de los tipos con matplotlib.
+    """
+    buf = BytesIO()
+    if chart_info.get("type") != "bar":
+        create_matplotlib_chart(chart_info, flat_friendly_names, buf)
+        buf.seek(0)
+        return buf
+
+    labels = chart_info.get("labels", [])
+    series = {}
+    for key in _series_keys(chart_info):
+        vals = list(chart_info.get(key) or [])
+        # Normalizar longitud de vals para que coincida con las etiquetas
+        vals = (vals + [0] * len(labels))[: len(labels)]
+        label_full = flat_friendly_names.get(key, key.replace("_", " ").capitalize())
+        # Dividir etiquetas largas en varias líneas para que no encojan el gráfico
+        series[textwrap.fill(label_full, width=22)] = vals
+
+    if not series:
+        # nada que dibujar
+        return None
+
+    title = chart_info.get("title") or chart_info.get("titulo") or ""
+    render_bar_chart(labels, series, CHART_PALETTE, title, buf)
+    buf.seek(0)
+    return buf
 
-        ax = plt.gca()
+
+@functools.lru_cache(maxsize=None)
+def _chart_figure():
+    """
+    Figura matplotlib reutilizada por create_matplotlib_chart. Se crea (y se
+    importa pyplot) recién con el primer gráfico que no es de barras.
+    """
+    import matplotlib.pyplot as plt
+
+    return plt.subplots(figsize=(10, 5))
+
+
+def create_matplotlib_chart(chart_info, flat_friendly_names, output):
+    import matplotlib.ticker as mtick
+
+    # La figura se comparte entre llamadas: se limpia en lugar de recrearla
+    with _FIG_LOCK:
+        fig, ax = _chart_figure()
+        ax.clear()
+        ctype = chart_info.get("type")
+
+        # Título si viene en la definición del gráfico
+        title = chart_info.get("title") or chart_info.get("titulo") or ""
+        if title:
+            ax.set_title(title, fontsize=20, fontweight="bold", pad=20)
+
+        # Aumentar tamaño de fuente para los ejes
+        ax.tick_params(labelsize=18)
+
+        labels = chart_info.get("labels", [])
+        x = range(len(labels))
+
+        # Paleta de colores para series (se rotan si hay más series)
+        palette = CHART_PALETTE
+
+        series_keys = _series_keys(chart_info)
+
+        if ctype == "line":
+            for idx, key in enumerate(series_keys):
+                vals = list(chart_info.get(key) or [])
+                # Normalizar longitud de vals para que coincida con las etiquetas
+                if len(vals) < len(labels):
+                    vals = vals + [None] * (len(labels) - len(vals))
+                elif len(vals) > len(labels):
+                    vals = vals[: len(labels)]
+                label_full = flat_friendly_names.get(
+                    key, key.replace("_", " ").capitalize()
+                )
+                # Dividir etiquetas largas en varias líneas
+                label = textwrap.fill(label_full, width=22)
+
+                color = palette[idx % len(palette)]
+                ax.plot(x, vals, label=label, marker="o", color=color)
+
+            ax.set_xticks(x)
+            ax.set_xticklabels(labels, rotation=45, fontsize=16)
+            ax.grid(axis="y", linestyle="-", color="#dcdcdc", linewidth=0.8)
+            ax.legend(loc="best", fontsize=18)
+
+        # Formato eje Y con separador de miles
         ax.yaxis.set_major_formatter(mtick.FuncFormatter(lambda x, pos: f"{int(x):,}"))
-    except Exception:
-        pass
 
-    # Ajusta el layout para asegurar que la leyenda no se corte
-    plt.tight_layout(rect=[0, 0.03, 0.95, 0.97])
-    plt.savefig(output_file, dpi=150, transparent=True)
-    plt.close()
+        # Ajusta el layout para asegurar que la leyenda no se corte
+        fig.tight_layout(rect=[0, 0.03, 0.95, 0.97])
+        fig.savefig(output, format="png", dpi=150, transparent=True)
 
 
-def add_charts(slide, charts, friendly_names, replacements_chart):
-    to_sort = []
-    for name in replacements_chart:
-        for s in slide.shapes:
-            if name == s.name:
-                to_sort.append(s)
+@functools.lru_cache(maxsize=32)
+def _load_chart_config(product: str) -> dict:
+    """
+    Lee (una sola vez por producto) chart_<product>.json.
+    El dict devuelto se comparte entre llamadas: tratarlo como solo lectura.
+    """
+    with open(f"{DATA_DIR}/charts/chart_{product}.json", "r", encoding="utf-8") as f:
+        return json.load(f)
 
-    chart_placeholders = sorted(
-        to_sort,
-        key=lambda s: s.name,  # Ordenar por posición de izquierda a derecha
-    )
 
-    for i, (name, chart_info) in enumerate(charts.items()):
-        if i >= len(chart_placeholders):
-            break  # No hay más placeholders para gráficos
+@functools.lru_cache(maxsize=32)
+def _load_friendly_names(product: str) -> dict:
+    """Mapa plano {serie: nombre amigable} de todos los gráficos del producto."""
+    return {
+        key: value
+        for chart in _load_chart_config(product).values()
+        for key, value in chart.items()
+    }
+
+
+def find_chart_placeholders(slide, replacements_chart):
+    """Placeholders de gráficos de la diapositiva, en el orden de replacements_chart."""
+    # Un solo recorrido de slide.shapes (python-pptx re-parsea el XML en cada uno)
+    shape_by_name = {s.name: s for s in slide.shapes}
+    return [shape_by_name[n] for n in replacements_chart if n in shape_by_name]
 
-        placeholder = to_sort[i]
+
+def add_charts(slide, placeholders, charts, flat_friendly_names):
+    """Renderiza cada gráfico en memoria y lo inserta en su placeholder."""
+    # Un gráfico por placeholder disponible
+    for placeholder, (name, chart_info) in zip(placeholders, charts.items()):
         # Asegurar título por defecto basado en el nombre del gráfico
         if not chart_info.get("title") and not chart_info.get("titulo") and name:
             chart_info["title"] = name.replace("_", " ").capitalize()
 
-        # fn = os.path.join(DATA_DIR, f"{name}.png")
-        fn = f"/tmp/{name}.png"
-        create_matplotlib_chart(chart_info, friendly_names, fn)
-        insert_image_scaled_by_width(slide, placeholder, fn)
+        buf = create_chart(chart_info, flat_friendly_names)
+        if buf:
+            insert_image_scaled_by_width(slide, placeholder, buf)
 
 
 # --------------------------------------------------------------
@@ -339,12 +503,9 @@ def generar_contenido(data, logo_stream):
 
         # Cargamos los nombres amigables para las leyendas de los gráficos
         product_type = slide_item.get("type")
-        friendly_names = {}
+        flat_friendly_names = {}
         try:
-            with open(
-                f"{DATA_DIR}/charts/chart_{product_type}.json", "r", encoding="utf-8"
-            ) as f:
-                friendly_names = json.load(f)
+            flat_friendly_names = _load_friendly_names(product_type)
         except FileNotFoundError:
             log(
                 f"⚠️  No se encontró el archivo de configuración de gráficos: chart_{product_type}.json"
@@ -374,7 +535,8 @@ def generar_contenido(data, logo_stream):
         # Insertar gráficos
         charts = slide_content.get("charts", {})
         if charts:
-            add_charts(slide, charts, friendly_names, replacements_chart)
+            placeholders = find_chart_placeholders(slide, replacements_chart)
+            add_charts(slide, placeholders, charts, flat_friendly_names)
 
         _insert_logo_with_scaling(slide, logo_stream)
 
@@ -410,11 +572,20 @@ def generar_cierre(data, logo_stream):
 # --------------------------------------------------------------
 # PPTX → PDF
 # --------------------------------------------------------------
-def convert_to_pdf(pptx_file):
-    output_dir = f"{DATA_DIR}/pdf-parts"
+def _pdf_path(pptx_file):
+    return os.path.join(
+        PDF_PARTS_DIR, os.path.basename(pptx_file).replace(".pptx", ".pdf")
+    )
+
+
+def convert_many_to_pdf(pptx_files):
+    """
+    Convierte varios pptx a PDF con una única invocación de LibreOffice,
+    pagando el arranque de soffice una sola vez para todo el lote.
+    """
+    output_dir = PDF_PARTS_DIR
     os.makedirs(output_dir, exist_ok=True)
-    base_name = os.path.basename(pptx_file).replace(".pptx", ".pdf")
-    pdf_file = os.path.join(output_dir, base_name)
+    pdf_files = [_pdf_path(f) for f in pptx_files]
 
     # Usar un directorio de instalación único para evitar bloqueos y problemas de permisos
     user_inst = f"-env:UserInstallation=file:///tmp/lo_{uuid.uuid4()}"
@@ -424,16 +595,34 @@ def convert_to_pdf(pptx_file):
         "--headless",
         "--convert-to",
         "pdf",
-        pptx_file,
         "--outdir",
         output_dir,
+        *pptx_files,
     ]
     try:
         subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
     except subprocess.CalledProcessError as e:
         log(f"⚠️ Error en LibreOffice: {e.stderr.decode('utf-8', errors='replace')}")
         raise
-    return pdf_file
+    return pdf_files
+
+
+def convert_all_to_pdf(pptx_files):
+    """
+    Reparte los pptx en un lote por worker (hasta LO_MAX_WORKERS) y convierte
+    los lotes en paralelo.
+    Devuelve un dict {pptx: pdf}.
+    """
+    if not pptx_files:
+        return {}
+
+    pdf_by_pptx = {}
+    workers = min(len(pptx_files), LO_MAX_WORKERS)
+    batches = [pptx_files[i::workers] for i in range(workers)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch, pdfs in zip(batches, executor.map(convert_many_to_pdf, batches)):
+            pdf_by_pptx.update(zip(batch, pdfs))
+    return pdf_by_pptx
 
 
 def apply_background_to_pdf(content_pdf_path, background_pdf_path):
@@ -441,37 +630,32 @@ def apply_background_to_pdf(content_pdf_path, background_pdf_path):
     Aplica un fondo desde un PDF a otro PDF que contiene el contenido.
     El contenido se superpone sobre el fondo.
     """
-    content_reader = PdfReader(content_pdf_path)
-    background_reader = PdfReader(background_pdf_path)
-    writer = PdfWriter()
-
-    # Asume que el PDF de fondo tiene al menos tantas páginas como el de contenido
-    for i, content_page in enumerate(content_reader.pages):
-        # Obtiene la página de fondo correspondiente
-        background_page = background_reader.pages[i % len(background_reader.pages)]
-        # Superpone el contenido (que tiene fondo transparente/blanco) sobre el fondo
-        background_page.merge_page(content_page)
-        writer.add_page(background_page)
-
-    with open(content_pdf_path, "wb") as f:
-        writer.write(f)
+    with pikepdf.open(
+        content_pdf_path, allow_overwriting_input=True
+    ) as content, pikepdf.open(background_pdf_path) as background:
+        # Si el fondo tiene menos páginas que el contenido, se repiten cíclicamente
+        n_fondos = len(background.pages)
+        for i, content_page in enumerate(content.pages):
+            # Dibuja la página de fondo por debajo del contenido (lo hace libqpdf)
+            content_page.add_underlay(background.pages[i % n_fondos])
+        content.save(content_pdf_path)
 
 
 # --------------------------------------------------------------
 # UNIR PDFs
 # --------------------------------------------------------------
 def unir_pdfs(pdf_paths, empresa, type="", split=0):
-    writer = PdfWriter()
-    for pdf_path in pdf_paths:
-        reader = PdfReader(pdf_path)
-        for page in reader.pages:
-            writer.add_page(page)
-
     output_dir = f"{DATA_DIR}/generados"
     os.makedirs(output_dir, exist_ok=True)
     out = f"{output_dir}/informe_{empresa}{'.' + type if split == 1 else ''}.pdf"
-    with open(out, "wb") as f:
-        writer.write(f)
+
+    # pikepdf (libqpdf) copia las páginas en C++; los PDF de origen deben
+    # seguir abiertos hasta guardar el resultado.
+    with ExitStack() as stack, pikepdf.Pdf.new() as merged:
+        for pdf_path in pdf_paths:
+            src = stack.enter_context(pikepdf.open(pdf_path))
+            merged.pages.extend(src.pages)
+        merged.save(out)
     return out
 
 
@@ -495,9 +679,12 @@ def main():
     contenido_files = generar_contenido(data, logo_stream)
     types = [slide.get("type", "") for slide in data.get("slides", [])]
 
-    # Pre-convert common parts to avoid redundant processing
-    portada_pdf = convert_to_pdf(portada) if (data["save"] and portada) else None
-    cierre_pdf = convert_to_pdf(cierre) if (data["save"] and cierre) else None
+    # Convertimos todas las partes de una vez (un proceso de LibreOffice por lote)
+    pptx_files = [f for f in (portada, *contenido_files, cierre) if f]
+    pdf_by_pptx = convert_all_to_pdf(pptx_files)
+    portada_pdf = pdf_by_pptx.get(portada)
+    cierre_pdf = pdf_by_pptx.get(cierre)
+    contenido_pdfs = [pdf_by_pptx[f] for f in contenido_files]
 
     informe_name = []
     if split == 0:
@@ -505,20 +692,20 @@ def main():
         if portada_pdf:
             pdf_files_to_merge.append(portada_pdf)
 
-        pdf_files_to_merge.extend([convert_to_pdf(f) for f in contenido_files])
+        pdf_files_to_merge.extend(contenido_pdfs)
 
         if cierre_pdf:
             pdf_files_to_merge.append(cierre_pdf)
 
         informe_name.append(unir_pdfs(pdf_files_to_merge, empresa))
     else:
-        for idx, content_pptx in enumerate(contenido_files):
+        for idx, content_pdf in enumerate(contenido_pdfs):
 
             pdf_files_to_merge = []
             if portada_pdf:
                 pdf_files_to_merge.append(portada_pdf)
 
-            pdf_files_to_merge.append(convert_to_pdf(content_pptx))
+            pdf_files_to_merge.append(content_pdf)
 
             if cierre_pdf:
                 pdf_files_to_merge.append(cierre_pdf)
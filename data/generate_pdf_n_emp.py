@@ -1,38 +1,61 @@
 #!/usr/bin/env python3
 import sys
 import json
-import base64
+import binascii
 import subprocess
 import os
+import shutil
 import warnings
+import uuid
+import threading
+import functools
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
 from pptx import Presentation
 from pptx.util import Inches, Pt
 import matplotlib.pyplot as plt
-from pypdf import PdfReader, PdfWriter
+import pikepdf
 import requests
 import textwrap
 import numpy as np
 from PIL import Image
 from io import BytesIO
 
+try:
+    # Decodificador SIMD (AVX2/SSSE3), misma API que base64.b64decode
+    from pybase64 import b64decode
+except ImportError:
+    from base64 import b64decode
+
+try:
+    # Parser JSON en Rust; acepta bytes directamente
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 warnings.filterwarnings("ignore")
 DATA_DIR = "/data"
 
+# Buffer del lienzo de logos, uno por hilo; se reutiliza entre llamadas
+_CANVAS_POOL = threading.local()
+
+# Formatos (según PIL) que python-pptx acepta tal cual en add_picture
+PPTX_IMAGE_FORMATS = {"PNG", "JPEG", "GIF", "BMP", "TIFF"}
+
 
 # --------------------------------------------------------------
 # UTILS
 # --------------------------------------------------------------
-def get_logo_from_base64(base64_string: str) -> BytesIO | None:
+def get_logo_from_base64(base64_string: str) -> bytes | None:
     """
-    Decodifica una cadena Base64 y devuelve un objeto BytesIO con los datos de la imagen.
+    Decodifica una cadena Base64 y devuelve los bytes crudos de la imagen.
     Retorna None si la cadena está vacía o es inválida.
     """
     if not base64_string:
         return None
     try:
-        image_data = base64.b64decode(base64_string)
-        return BytesIO(image_data)
-    except base64.binascii.Error:
+        return b64decode(base64_string)
+    except binascii.Error:
         log("⚠️ Error de decodificación Base64. La cadena del logo podría ser inválida.")
         return None
 
@@ -41,26 +64,24 @@ def replace_placeholders(slide, replacements):
     """
     Busca un placeholder por su nombre (definido en el Panel de Selección de PowerPoint)
     y reemplaza su texto por el valor correspondiente.
+    Recorre las formas una sola vez y resuelve cada texto con una búsqueda en el dict.
     """
 
-    for key, value in replacements.items():
-        for shape in slide.shapes:
-            if shape.has_text_frame:
-                texto = shape.text.strip()
-                if texto == key:
-                    # Asegurar que el valor es string
-                    if not isinstance(value, str):
-                        val_str = str(value)
-                    else:
-                        val_str = value
-
-                    # Reemplazar secuencias literales "\\n" por saltos de línea reales
-                    # y también manejar escapes dobles si vienen.
-                    val_str = val_str.replace("\\n", "\n")
-                    val_str = val_str.replace("\\\n", "\n")
+    def normalizar(value):
+        # Asegurar que el valor es string
+        val_str = value if isinstance(value, str) else str(value)
+        # Reemplazar secuencias literales "\\n" por saltos de línea reales
+        # y también manejar escapes dobles si vienen.
+        return val_str.replace("\\n", "\n").replace("\\\n", "\n")
 
-                    # Asignar al cuadro de texto
-                    shape.text = val_str
+    for shape in slide.shapes:
+        if not shape.has_text_frame:
+            continue
+        key = shape.text.strip()
+        if key not in replacements:
+            continue
+        # Asignar al cuadro de texto
+        shape.text = normalizar(replacements[key])
 
 
 def insert_image_scaled_by_width(slide, placeholder, image_path_or_stream):
@@ -149,6 +170,60 @@ def set_placeholder_text(slide, idx, text):
     tf.text = text
 
 
+def _logo_canvas(height: int, width: int) -> np.ndarray:
+    """
+    Devuelve un lienzo RGBA (height, width, 4) en cero, tomado del buffer del
+    hilo actual. El buffer solo se realoca cuando hace falta uno más grande.
+    """
+    size = height * width * 4
+    buffer = getattr(_CANVAS_POOL, "buffer", None)
+    if buffer is None or buffer.size < size:
+        buffer = np.empty(size, dtype=np.uint8)
+        _CANVAS_POOL.buffer = buffer
+    canvas = buffer[:size].reshape(height, width, 4)
+    canvas.fill(0)
+    return canvas
+
+
+def _decode_resize_logo(b64_string: str, target_height: int) -> Image.Image | None:
+    """
+    Decodifica un logo Base64 y lo devuelve en RGBA con altura target_height.
+    Retorna None si la cadena o la imagen son inválidas.
+    """
+    img_bytes = get_logo_from_base64(b64_string)
+    if not img_bytes:
+        return None
+    try:
+        # BytesIO sobre un bytes existente no copia los datos
+        img = Image.open(BytesIO(img_bytes))
+
+        resample = Image.LANCZOS
+        if img.format == "JPEG" and img.height > target_height:
+            # libjpeg decodifica directamente a una escala reducida
+            # (1/2, 1/4, 1/8) no menor al doble del tamaño final;
+            # a 120px de alto BICUBIC es suficiente.
+            new_width = int(img.width * target_height / img.height)
+            img.draft(img.mode, (new_width * 2, target_height * 2))
+            resample = Image.BICUBIC
+
+        # La mayoría de los logos PNG ya vienen en RGBA: evitar la copia
+        if img.mode != "RGBA":
+            img = img.convert("RGBA")
+
+        # 🔥 resize proporcional (si ya tiene la altura, no se toca)
+        if img.height != target_height:
+            ratio = target_height / img.height
+            new_width = int(img.width * ratio)
+            img = img.resize((new_width, target_height), resample)
+
+        # Forzar la decodificación en este hilo (Image.open es perezoso)
+        img.load()
+        return img
+    except Exception as e:
+        log(f"⚠️ Error opening image from stream: {e}")
+        return None
+
+
 def create_composite_logo_from_base64_list(
     logos_base64_list: list[str],
     target_height: int = 120,  # altura uniforme
@@ -157,48 +232,73 @@ def create_composite_logo_from_base64_list(
     if not logos_base64_list:
         return None
 
-    images = []
-    for b64_string in logos_base64_list:
-        img_stream = get_logo_from_base64(b64_string)
-        if img_stream:
-            try:
-                img = Image.open(img_stream).convert("RGBA")
-
-                # 🔥 resize proporcional
-                ratio = target_height / img.height
-                new_width = int(img.width * ratio)
-                img = img.resize((new_width, target_height), Image.LANCZOS)
-
-                images.append(img)
-            except Exception as e:
-                log(f"⚠️ Error opening image from stream: {e}")
+    # Un solo logo: python-pptx ya lo escala al placeholder, así que se usan
+    # los bytes originales sin redimensionar ni recodificar a PNG, siempre que
+    # python-pptx acepte el formato (p. ej. WebP se recodifica más abajo).
+    if len(logos_base64_list) == 1:
+        img_bytes = get_logo_from_base64(logos_base64_list[0])
+        if not img_bytes:
+            return None
+        try:
+            # Image.open solo lee la cabecera: valida el formato sin decodificar
+            img_format = Image.open(BytesIO(img_bytes)).format
+        except Exception as e:
+            log(f"⚠️ Error opening image from stream: {e}")
+            return None
+        if img_format in PPTX_IMAGE_FORMATS:
+            return BytesIO(img_bytes)
+
+    # Cada logo se decodifica y redimensiona en su propio hilo (PIL libera el GIL)
+    decode = functools.partial(_decode_resize_logo, target_height=target_height)
+    workers = min(len(logos_base64_list), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        images = [
+            img for img in executor.map(decode, logos_base64_list) if img is not None
+        ]
 
     if not images:
         return None
 
-    max_width = max(img.width for img in images)
-    total_height = sum(img.height for img in images)
+    # (pixeles, ancho, alto) calculados una sola vez por logo
+    logos = [(np.asarray(img), img.width, img.height) for img in images]
+    max_width = max(w for _, w, _ in logos)
+    total_height = sum(h for _, _, h in logos)
 
-    composite_image = Image.new("RGBA", (max_width, total_height), (0, 0, 0, 0))
+    # Lienzo transparente: los logos no se superponen, así que basta con
+    # copiar cada uno en su franja (sin mezcla alfa).
+    canvas = _logo_canvas(total_height, max_width)
 
     y_offset = 0
-    for img in images:
-        x_offset = (max_width - img.width) // 2
-        composite_image.paste(img, (x_offset, y_offset), img)
-        y_offset += img.height
+    for pixels, w, h in logos:
+        x_offset = (max_width - w) // 2
+        canvas[y_offset : y_offset + h, x_offset : x_offset + w] = pixels
+        y_offset += h
+
+    composite_image = Image.fromarray(canvas)
 
     output_stream = BytesIO()
-    composite_image.save(output_stream, format="PNG")
+    # Imagen intermedia que se incrusta en el PPTX y se descarta: deflate rápido
+    composite_image.save(output_stream, format="PNG", compress_level=1, optimize=False)
     output_stream.seek(0)
 
     return output_stream
 
 
+@functools.lru_cache(maxsize=None)
+def _template_bytes(template_file: str) -> bytes:
+    """
+    Devuelve el contenido de una plantilla .pptx; se lee del disco una sola vez
+    por proceso y luego cada Presentation se abre desde memoria.
+    """
+    with open(f"{DATA_DIR}/plantillas/{template_file}", "rb") as f:
+        return f.read()
+
+
 # --------------------------------------------------------------
 # PORTADA
 # --------------------------------------------------------------
 def generar_portada(data, logo_stream):
-    prs = Presentation(f"{DATA_DIR}/plantillas/plantilla_portada.pptx")
+    prs = Presentation(BytesIO(_template_bytes("plantilla_portada.pptx")))
     slide = prs.slides[0]
 
     replacements = {
@@ -224,7 +324,7 @@ def generar_portada(data, logo_stream):
 # --------------------------------------------------------------
 def generar_cierre(data, logo_stream):
     cierre = data["despedida"]
-    prs = Presentation(f"{DATA_DIR}/plantillas/plantilla_cierre.pptx")
+    prs = Presentation(BytesIO(_template_bytes("plantilla_cierre.pptx")))
     slide = prs.slides[0]
 
     replacements = {
@@ -245,56 +345,52 @@ def generar_cierre(data, logo_stream):
 # --------------------------------------------------------------
 # PPTX → PDF
 # --------------------------------------------------------------
-def convert_to_pdf(pptx_file):
+def convert_to_pdf(pptx_files):
+    """
+    Convierte una lista de pptx a PDF con una única invocación de LibreOffice
+    (un solo arranque de soffice) y devuelve las rutas de los PDF en el mismo orden.
+    """
     output_dir = f"{DATA_DIR}/pdf-parts"
-    base_name = os.path.basename(pptx_file).replace(".pptx", ".pdf")
-    pdf_file = os.path.join(output_dir, base_name)
+    os.makedirs(output_dir, exist_ok=True)
+    pdf_files = [
+        os.path.join(output_dir, os.path.basename(f).replace(".pptx", ".pdf"))
+        for f in pptx_files
+    ]
+    # Perfil propio de esta ejecución (las ejecuciones de n8n pueden correr a
+    # la vez); se borra al terminar para no acumular perfiles en /tmp.
+    profile_dir = f"/tmp/lo_{uuid.uuid4()}"
     cmd = [
         "libreoffice",
+        f"-env:UserInstallation=file://{profile_dir}",
         "--headless",
         "--convert-to",
         "pdf",
-        pptx_file,
         "--outdir",
         output_dir,
+        *pptx_files,
     ]
-    subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-    return pdf_file
-
-
-def apply_background_to_pdf(content_pdf_path, background_pdf_path):
-    """
-    Aplica un fondo desde un PDF a otro PDF que contiene el contenido.
-    El contenido se superpone sobre el fondo.
-    """
-    content_reader = PdfReader(content_pdf_path)
-    background_reader = PdfReader(background_pdf_path)
-    writer = PdfWriter()
-
-    # Asume que el PDF de fondo tiene al menos tantas páginas como el de contenido
-    for i, content_page in enumerate(content_reader.pages):
-        # Obtiene la página de fondo correspondiente
-        background_page = background_reader.pages[i % len(background_reader.pages)]
-        # Superpone el contenido (que tiene fondo transparente/blanco) sobre el fondo
-        background_page.merge_page(content_page)
-        writer.add_page(background_page)
-
-    with open(content_pdf_path, "wb") as f:
-        writer.write(f)
+    try:
+        subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    except subprocess.CalledProcessError as e:
+        log(f"⚠️ Error en LibreOffice: {e.stderr.decode('utf-8', errors='replace')}")
+        raise
+    finally:
+        shutil.rmtree(profile_dir, ignore_errors=True)
+    return pdf_files
 
 
 # --------------------------------------------------------------
 # UNIR PDFs
 # --------------------------------------------------------------
 def unir_pdfs(pdf_paths, empresa):
-    writer = PdfWriter()
-    for pdf_path in pdf_paths:
-        reader = PdfReader(pdf_path)
-        for page in reader.pages:
-            writer.add_page(page)
     out = f"{DATA_DIR}/generados/informe_{empresa}.pdf"
-    with open(out, "wb") as f:
-        writer.write(f)
+    # pikepdf (libqpdf) copia las páginas en C++; los PDF de origen deben
+    # seguir abiertos hasta guardar el resultado.
+    with ExitStack() as stack, pikepdf.Pdf.new() as merged:
+        for pdf_path in pdf_paths:
+            src = stack.enter_context(pikepdf.open(pdf_path))
+            merged.pages.extend(src.pages)
+        merged.save(out)
     return out
 
 
@@ -303,7 +399,7 @@ def unir_pdfs(pdf_paths, empresa):
 # --------------------------------------------------------------
 def main():
     raw = sys.argv[1]
-    input_data = json.loads(base64.b64decode(raw))
+    input_data = json_loads(b64decode(raw))
 
     main_data = input_data["main"]
     emp_codes = input_data.get("emp_codes", [])
@@ -311,29 +407,30 @@ def main():
 
     logo_stream = create_composite_logo_from_base64_list(logos_base64_list)
 
-    empresa = ""
-    length_emp_codes = len(emp_codes)
-    for i, emp_code in enumerate(emp_codes):
-        empresa += emp_code + "-" if i != length_emp_codes - 1 else emp_code
-    empresa = empresa.lower()
-    portada_pptx_file = generar_portada(main_data, logo_stream)
-    cierre_pptx_file = generar_cierre(main_data, logo_stream)
+    empresa = "-".join(emp_codes).lower()
 
-    pdf_files_to_merge = []
-    pdf_files_to_merge.append(convert_to_pdf(portada_pptx_file))
+    # Portada y cierre son independientes: se generan en paralelo.
+    # Cada hilo recibe su propia copia del logo (un BytesIO no es thread-safe).
+    def logo_copy():
+        return BytesIO(logo_stream.getvalue()) if logo_stream else None
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        portada_future = executor.submit(generar_portada, main_data, logo_copy())
+        cierre_future = executor.submit(generar_cierre, main_data, logo_copy())
+        portada_pptx_file = portada_future.result()
+        cierre_pptx_file = cierre_future.result()
+
+    # Una sola invocación de LibreOffice para ambos archivos
+    portada_pdf, cierre_pdf = convert_to_pdf([portada_pptx_file, cierre_pptx_file])
 
     full_informes_paths = [
         os.path.join(DATA_DIR, "generados", f"informe_{f.lower()}.pdf")
         for f in emp_codes
     ]
-    pdf_files_to_merge.extend(full_informes_paths)
-
-    pdf_files_to_merge.append(convert_to_pdf(cierre_pptx_file))
-
-    final_pdf = unir_pdfs(pdf_files_to_merge, empresa)
+    pdf_files_to_merge = [portada_pdf, *full_informes_paths, cierre_pdf]
 
-    # with open(final_pdf, "rb") as f:
-    #     b64 = base64.b64encode(f.read()).decode()
+    # El PDF final queda en disco; n8n lo lee por nombre, no se devuelve inline
+    unir_pdfs(pdf_files_to_merge, empresa)
 
     print(json.dumps({"file_name": os.path.basename(f"informe_{empresa}")}))
 
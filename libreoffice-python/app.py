@@ -1,10 +1,17 @@
+import asyncio
+import functools
+import hashlib
+import math
 import os
-import json
+from collections import OrderedDict, defaultdict
+from contextlib import ExitStack, asynccontextmanager
 import base64
 import subprocess
-import uuid
+import tempfile
 import warnings
 import textwrap
+import threading
+import time
 from datetime import datetime, timedelta
 from io import BytesIO
 from typing import Dict, Any, List
@@ -13,16 +20,81 @@ from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
 from pptx import Presentation
 from pptx.util import Inches
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import matplotlib.ticker as mtick
 import numpy as np
-from pypdf import PdfReader, PdfWriter
-from PIL import Image
+import pikepdf
+from PIL import Image, ImageDraw, ImageFont
+
+try:
+    # Parser/serializador JSON en Rust; trabaja directo con bytes
+    from orjson import loads as json_loads
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    from json import loads as json_loads
+    from fastapi.responses import JSONResponse as DefaultResponse
+
+try:
+    # Bridge UNO de LibreOffice (paquete python3-uno); opcional
+    import uno
+    from com.sun.star.beans import PropertyValue
+    from com.sun.star.lang import DisposedException
+    from com.sun.star.uno import RuntimeException as UnoRuntimeException
+except ImportError:
+    uno = None
 
 # Configuración
 warnings.filterwarnings("ignore")
 DATA_DIR = "/data"
-app = FastAPI()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # La espera de soffice (hasta 30 s) corre en un hilo: no bloquea el event loop
+    await asyncio.to_thread(start_lo_daemon)
+    await warm_lo_profiles()
+    yield
+    stop_lo_daemon()
+
+
+app = FastAPI(default_response_class=DefaultResponse, lifespan=lifespan)
+
+# Tamaño máximo (px) del logo insertado en portada, contenidos y cierre
+LOGO_MAX_SIZE = (800, 800)
+
+# Logos compuestos ya generados (LRU por digest de los logos en Base64)
+COMPOSITE_LOGO_CACHE_SIZE = 16
+_composite_logos = OrderedDict()
+
+# Figura matplotlib reutilizada por create_matplotlib_chart, una por hilo
+_CHART_FIG = threading.local()
+
+# Perfiles (UserInstallation) de LibreOffice para la CLI: uno por instancia
+# concurrente. Tomar un perfil de la cola limita las conversiones a la vez y
+# evita que dos soffice compartan perfil; se reutilizan entre conversiones.
+# El pod tiene 1 CPU y 1 GiB: por defecto hasta 2 soffice (LO_MAX_WORKERS).
+LO_MAX_WORKERS = max(1, int(os.environ.get("LO_MAX_WORKERS", "2")))
+LO_PROFILE_DIRS = [f"/tmp/lo_profile_{os.getpid()}_{i}" for i in range(LO_MAX_WORKERS)]
+LO_PROFILES = asyncio.Queue()
+for profile_dir in LO_PROFILE_DIRS:
+    LO_PROFILES.put_nowait(profile_dir)
+# Tarea que inicializa los perfiles en segundo plano (ver warm_lo_profiles)
+lo_warmup = None
+
+# soffice persistente controlado por UNO (si python3-uno está disponible)
+LO_UNO_HOST = "127.0.0.1"
+LO_UNO_PORT = 2002
+LO_UNO_SOCKET = f"socket,host={LO_UNO_HOST},port={LO_UNO_PORT};urp;"
+LO_UNO_ACCEPT = LO_UNO_SOCKET + "StarOffice.ServiceManager"
+LO_UNO_CONNECTION = "uno:" + LO_UNO_SOCKET + "StarOffice.ComponentContext"
+LO_UNO_LOCK = asyncio.Lock()
+lo_daemon = None
+lo_desktop = None
+# Tarea que reinicia el soffice de UNO si se cae; mientras tanto se usa la CLI
+lo_restart = None
+# True si el soffice de UNO se cayó y no se pudo volver a levantar
+lo_failed = False
 
 
 # Modelos de datos
@@ -53,26 +125,51 @@ def log(msg):
     print(msg, flush=True)
 
 
-def get_logo_from_base64(base64_string: str) -> BytesIO | None:
+def get_logo_from_base64(base64_string: str) -> bytes | None:
     if not base64_string:
         return None
     try:
-        image_data = base64.b64decode(base64_string)
-        return BytesIO(image_data)
+        return base64.b64decode(base64_string)
     except Exception:
         log("⚠️ Error de decodificación Base64.")
         return None
 
 
+def prepare_logo(logo_bytes: bytes | None) -> bytes | None:
+    """
+    Deja el logo listo para insertarse en todas las diapositivas del informe:
+    si es más grande que LOGO_MAX_SIZE se reduce y se recodifica una sola vez.
+    """
+    if not logo_bytes:
+        return None
+    try:
+        img = Image.open(BytesIO(logo_bytes))
+        if img.width <= LOGO_MAX_SIZE[0] and img.height <= LOGO_MAX_SIZE[1]:
+            return logo_bytes
+        img.thumbnail(LOGO_MAX_SIZE, Image.BICUBIC)
+        if img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+            img = img.convert("RGBA")  # p. ej. JPEG CMYK: PNG no lo admite
+        output = BytesIO()
+        img.save(output, format="PNG")
+        return output.getvalue()
+    except Exception as e:
+        # Se inserta el original, como antes de ajustar el tamaño
+        log(f"⚠️ Error opening image from stream: {e}")
+        return logo_bytes
+
+
 def replace_placeholders(slide, replacements):
-    for key, value in replacements.items():
-        for shape in slide.shapes:
-            if shape.has_text_frame:
-                texto = shape.text.strip()
-                if texto == key:
-                    val_str = str(value) if not isinstance(value, str) else value
-                    val_str = val_str.replace("\\n", "\n").replace("\\\n", "\n")
-                    shape.text = val_str
+    # Una sola pasada por las formas; cada texto se resuelve en el dict
+    for shape in slide.shapes:
+        if not shape.has_text_frame:
+            continue
+        key = shape.text.strip()
+        if key not in replacements:
+            continue
+        value = replacements[key]
+        val_str = str(value) if not isinstance(value, str) else value
+        val_str = val_str.replace("\\n", "\n").replace("\\\n", "\n")
+        shape.text = val_str
 
 
 def insert_image_scaled_by_width(slide, placeholder, image_path_or_stream):
@@ -101,31 +198,63 @@ def insert_logo_preserving_aspect(slide, placeholder, logo_stream):
     pic.top = ph_top + (ph_h - new_h) // 2
 
 
-def _insert_logo_with_scaling(slide, logo_stream):
+def _insert_logo_with_scaling(slide, logo_bytes):
     LOGO_PLACEHOLDER_TYPE = 18
-    if not logo_stream:
+    if not logo_bytes:
         return
     for shape in slide.placeholders:
         if shape.placeholder_format.type == LOGO_PLACEHOLDER_TYPE:
-            insert_logo_preserving_aspect(slide, shape, logo_stream)
+            # Un BytesIO nuevo por diapositiva; los bytes se comparten
+            insert_logo_preserving_aspect(slide, shape, BytesIO(logo_bytes))
             break
 
 
 def create_composite_logo_from_base64_list(
     logos_base64_list: list[str], target_height: int = 120
-) -> BytesIO | None:
+) -> bytes | None:
+    """
+    PNG con los logos apilados. Se cachea por un digest de las cadenas Base64
+    (que pueden pesar varios MB cada una y no se retienen): requests con los
+    mismos logos no vuelven a pasar por PIL.
+    """
     if not logos_base64_list:
         return None
 
-    images = []
+    digest = hashlib.sha256()
     for b64_string in logos_base64_list:
-        img_stream = get_logo_from_base64(b64_string)
-        if img_stream:
+        digest.update(b64_string.encode())
+        digest.update(b"\0")
+    key = (digest.digest(), target_height)
+
+    if key in _composite_logos:
+        _composite_logos.move_to_end(key)
+        return _composite_logos[key]
+
+    composite = _composite_logo(logos_base64_list, target_height)
+    _composite_logos[key] = composite
+    if len(_composite_logos) > COMPOSITE_LOGO_CACHE_SIZE:
+        _composite_logos.popitem(last=False)
+    return composite
+
+
+def _composite_logo(logos_base64: list[str], target_height: int) -> bytes | None:
+    images = []
+    for b64_string in logos_base64:
+        img_bytes = get_logo_from_base64(b64_string)
+        if img_bytes:
             try:
-                img = Image.open(img_stream).convert("RGBA")
+                img = Image.open(BytesIO(img_bytes))
+                resample = Image.LANCZOS
+                if img.format == "JPEG" and img.height > target_height:
+                    # libjpeg decodifica a una escala reducida (1/2, 1/4, 1/8)
+                    # no menor al doble del tamaño final; BICUBIC alcanza.
+                    new_width = int(img.width * target_height / img.height)
+                    img.draft(img.mode, (new_width * 2, target_height * 2))
+                    resample = Image.BICUBIC
+                img = img.convert("RGBA")
                 ratio = target_height / img.height
                 new_width = int(img.width * ratio)
-                img = img.resize((new_width, target_height), Image.LANCZOS)
+                img = img.resize((new_width, target_height), resample)
                 images.append(img)
             except Exception as e:
                 log(f"⚠️ Error opening image from stream: {e}")
@@ -145,8 +274,34 @@ def create_composite_logo_from_base64_list(
 
     output_stream = BytesIO()
     composite_image.save(output_stream, format="PNG")
-    output_stream.seek(0)
-    return output_stream
+    return output_stream.getvalue()
+
+
+@functools.lru_cache(maxsize=None)
+def _template_bytes(template_file: str) -> bytes:
+    """Contenido de una plantilla .pptx, leído del disco una sola vez."""
+    with open(f"{DATA_DIR}/plantillas/{template_file}", "rb") as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=32)
+def _load_chart_config(product: str) -> dict:
+    """
+    Lee (una sola vez por producto) chart_<product>.json.
+    El dict devuelto se comparte entre requests: tratarlo como solo lectura.
+    """
+    with open(f"{DATA_DIR}/charts/chart_{product}.json", "rb") as f:
+        return json_loads(f.read())
+
+
+@functools.lru_cache(maxsize=32)
+def _load_friendly_names(product: str) -> dict:
+    """Mapa plano {serie: nombre amigable} de todos los gráficos del producto."""
+    return {
+        key: value
+        for chart in _load_chart_config(product).values()
+        for key, value in chart.items()
+    }
 
 
 def formatea_mes_anio_es(dt: datetime) -> str:
@@ -156,31 +311,199 @@ def formatea_mes_anio_es(dt: datetime) -> str:
 # --------------------------------------------------------------
 # GRÁFICOS
 # --------------------------------------------------------------
-def create_matplotlib_chart(chart_info, friendly_names, output_file):
-    plt.figure(figsize=(10, 5))
+CHART_SIZE = (1500, 750)  # 10x5 pulgadas a 150 dpi, igual que los gráficos matplotlib
+CHART_DPI = 150
+CHART_PALETTE = ["#4f81bd", "#9abb59", "#4bacc6", "#8064a2"]
+CHART_GRID_COLOR = "#dcdcdc"
+# Claves de un gráfico que no son series de datos
+CHART_META_KEYS = ("labels", "type", "title", "titulo")
+
+
+@functools.lru_cache(maxsize=None)
+def _chart_font(size_pt, bold=False):
+    """Carga (una sola vez por proceso) la fuente DejaVu en el tamaño pedido."""
+    name = "DejaVuSans-Bold.ttf" if bold else "DejaVuSans.ttf"
+    try:
+        return ImageFont.truetype(name, round(size_pt * CHART_DPI / 72))
+    except OSError:
+        log(f"⚠️ No se encontró la fuente {name}, se usa la fuente por defecto.")
+        return ImageFont.load_default()
+
+
+def _nice_ticks(max_value, target=5):
+    """Marcas 'redondas' del eje Y (1, 2 o 5 × 10^n) que cubren max_value."""
+    if max_value <= 0:
+        return [0, 1]
+    raw_step = max_value / target
+    magnitude = 10 ** math.floor(math.log10(raw_step))
+    step = next(m * magnitude for m in (1, 2, 5, 10) if m * magnitude >= raw_step)
+    step = max(1, step)
+    return [i * step for i in range(math.ceil(max_value / step) + 1)]
+
+
+def _series_keys(chart_info):
+    """Series del gráfico, en orden: las listas/tuplas de números."""
+    return [
+        key
+        for key, val in chart_info.items()
+        if key not in CHART_META_KEYS
+        and isinstance(val, (list, tuple))
+        and all(isinstance(v, (int, float)) for v in val)
+    ]
+
+
+def _series_values(chart_info, key, n, fill):
+    """Valores de la serie como array de n elementos (rellena con `fill` o recorta)."""
+    vals = np.asarray(chart_info.get(key) or [], dtype=np.float64)
+    if vals.size != n:
+        vals = np.pad(vals, (0, max(0, n - vals.size)), constant_values=fill)[:n]
+    return vals
+
+
+def render_bar_chart(labels, series, palette, title, output):
+    """
+    Dibuja un gráfico de barras agrupadas directamente con Pillow, con el mismo
+    aspecto que el de matplotlib: título, grilla horizontal, separador de miles
+    en el eje Y y leyenda a la derecha centrada verticalmente.
+    `series` es un dict {etiqueta de la leyenda: valores}; el PNG se escribe
+    en `output` (ruta o archivo abierto, p. ej. un BytesIO).
+    """
+    width, height = CHART_SIZE
+    img = Image.new("RGBA", CHART_SIZE, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+
+    title_font = _chart_font(20, bold=True)
+    xtick_font = _chart_font(16)
+    ytick_font = _chart_font(18)
+    legend_font = _chart_font(18)
+    pad = 20
+
+    # Eje Y: marcas redondas con separador de miles (y un 5% de margen arriba)
+    max_value = max((max(vals, default=0) for vals in series.values()), default=0)
+    ticks = _nice_ticks(max_value * 1.05)
+    tick_labels = [f"{int(t):,}" for t in ticks]
+    ytick_w = max(draw.textbbox((0, 0), t, font=ytick_font)[2] for t in tick_labels)
+
+    # Leyenda: cuadro de color + etiqueta (ya partida en varias líneas)
+    swatch = draw.textbbox((0, 0), "M", font=legend_font)[3]
+    legend_boxes = [
+        draw.multiline_textbbox((0, 0), label, font=legend_font) for label in series
+    ]
+    legend_w = max((b[2] for b in legend_boxes), default=0) + swatch * 2
+
+    title_h = draw.textbbox((0, 0), title, font=title_font)[3] if title else 0
+    xtick_h = draw.textbbox((0, 0), "Semana", font=xtick_font)[3]
+
+    # Área de dibujo
+    left = pad + ytick_w + pad
+    right = width - pad - legend_w - pad
+    top = pad + (title_h + pad * 2 if title else pad)
+    bottom = height - pad - xtick_h - pad
+
+    if title:
+        title_w = draw.textbbox((0, 0), title, font=title_font)[2]
+        draw.text(
+            ((left + right - title_w) // 2, pad), title, font=title_font, fill="black"
+        )
+
+    def y_px(value):
+        return bottom - (bottom - top) * value / ticks[-1]
+
+    # Grilla y etiquetas del eje Y
+    for tick, text in zip(ticks, tick_labels):
+        y = y_px(tick)
+        draw.line([(left, y), (right, y)], fill=CHART_GRID_COLOR, width=2)
+        box = draw.textbbox((0, 0), text, font=ytick_font)
+        draw.text(
+            (left - pad // 2 - box[2], y - box[3] / 2),
+            text,
+            font=ytick_font,
+            fill="black",
+        )
+
+    # Barras agrupadas: mismas posiciones que `ind + offset` en matplotlib
+    n = len(series)
+    slot_w = (right - left) / max(len(labels), 1)
+    bar_w = 0.7 / n if n else 0
+    for idx, vals in enumerate(series.values()):
+        color = palette[idx % len(palette)]
+        offset = (idx - (n - 1) / 2) * bar_w
+        for pos, value in enumerate(vals[: len(labels)]):
+            if value <= 0:
+                continue
+            center = left + slot_w * (pos + 0.5 + offset)
+            half = slot_w * bar_w * 0.95 / 2
+            draw.rectangle(
+                [(center - half, y_px(value)), (center + half, bottom)], fill=color
+            )
+
+    # Etiquetas del eje X centradas en cada grupo
+    for pos, text in enumerate(labels):
+        box = draw.textbbox((0, 0), text, font=xtick_font)
+        x = left + slot_w * (pos + 0.5) - box[2] / 2
+        draw.text((x, bottom + pad // 2), text, font=xtick_font, fill="black")
+
+    # Marco de los ejes
+    draw.rectangle([(left, top), (right, bottom)], outline="black", width=2)
+
+    # Leyenda a la derecha, centrada verticalmente respecto del área de dibujo
+    spacing = swatch * 1.2
+    legend_h = sum(b[3] for b in legend_boxes) + spacing * max(n - 1, 0)
+    y = (top + bottom - legend_h) / 2
+    x = right + pad
+    for idx, (label, box) in enumerate(zip(series, legend_boxes)):
+        color = palette[idx % len(palette)]
+        sy = y + (box[3] - swatch) / 2
+        draw.rectangle([(x, sy), (x + swatch, sy + swatch)], fill=color)
+        draw.multiline_text(
+            (x + swatch * 1.5, y), label, font=legend_font, fill="black"
+        )
+        y += box[3] + spacing
+
+    img.save(output, format="PNG")
+
+
+def _chart_figure():
+    """
+    Figura Agg del hilo actual (API orientada a objetos, sin pyplot): se crea
+    una vez y se limpia entre gráficos.
+    """
+    fig = getattr(_CHART_FIG, "fig", None)
+    if fig is None:
+        fig = Figure(figsize=(10, 5))
+        FigureCanvasAgg(fig)
+        _CHART_FIG.fig = fig
+    fig.clf()
+    return fig
+
+
+@functools.lru_cache(maxsize=1024)
+def _wrap_label(label: str) -> str:
+    # Los nombres de series se repiten entre gráficos: textwrap una vez por nombre
+    return textwrap.fill(label, width=22)
+
+
+def create_matplotlib_chart(chart_info, flat_friendly_names, output):
+    fig = _chart_figure()
+    ax = fig.add_subplot(111)
     ctype = chart_info.get("type")
     title = chart_info.get("title") or chart_info.get("titulo") or ""
     if title:
-        plt.title(title, fontsize=20, fontweight="bold", pad=20)
+        ax.set_title(title, fontsize=20, fontweight="bold", pad=20)
 
-    plt.xticks(fontsize=18)
-    plt.yticks(fontsize=18)
+    ax.tick_params(labelsize=18)
     labels = chart_info.get("labels", [])
     x = range(len(labels))
 
-    flat_friendly_names = {
-        k: v for chart in friendly_names.values() for k, v in chart.items()
-    }
-    palette = ["#4f81bd", "#9abb59", "#4bacc6", "#8064a2"]
+    palette = CHART_PALETTE
 
-    series_keys = []
-    for key, val in chart_info.items():
-        if key in ("labels", "type", "title", "titulo"):
-            continue
-        if isinstance(val, (list, tuple)) and all(
-            isinstance(v, (int, float)) for v in val
-        ):
-            series_keys.append(key)
+    series_keys = _series_keys(chart_info)
+
+    # Leyenda de cada serie (nombre amigable partido en líneas de 22 caracteres)
+    series_labels = [
+        _wrap_label(flat_friendly_names.get(key, key.replace("_", " ").capitalize()))
+        for key in series_keys
+    ]
 
     if ctype == "bar":
         n = len(series_keys)
@@ -188,24 +511,16 @@ def create_matplotlib_chart(chart_info, friendly_names, output_file):
             ind = np.arange(len(labels))
             total_width = 0.7
             bar_width = total_width / n
-            for idx, key in enumerate(series_keys):
-                vals = list(chart_info.get(key) or [])
-                if len(vals) < len(labels):
-                    vals += [0] * (len(labels) - len(vals))
-                elif len(vals) > len(labels):
-                    vals = vals[: len(labels)]
-
-                label_full = flat_friendly_names.get(
-                    key, key.replace("_", " ").capitalize()
-                )
-                label = textwrap.fill(label_full, width=22)
+            for idx, (key, label) in enumerate(zip(series_keys, series_labels)):
+                vals = _series_values(chart_info, key, len(labels), 0)
                 color = palette[idx % len(palette)]
                 offset = (idx - (n - 1) / 2) * bar_width
-                plt.bar(ind + offset, vals, bar_width * 0.95, label=label, color=color)
+                ax.bar(ind + offset, vals, bar_width * 0.95, label=label, color=color)
 
-            plt.xticks(ind, labels, rotation=0, fontsize=16)
-            plt.grid(axis="y", linestyle="-", color="#dcdcdc", linewidth=0.8)
-            plt.legend(
+            ax.set_xticks(ind)
+            ax.set_xticklabels(labels, rotation=0, fontsize=16)
+            ax.grid(axis="y", linestyle="-", color="#dcdcdc", linewidth=0.8)
+            ax.legend(
                 loc="center left",
                 bbox_to_anchor=(1, 0.5),
                 frameon=False,
@@ -214,65 +529,131 @@ def create_matplotlib_chart(chart_info, friendly_names, output_file):
             )
 
     elif ctype == "line":
-        for idx, key in enumerate(series_keys):
-            vals = list(chart_info.get(key) or [])
-            if len(vals) < len(labels):
-                vals += [None] * (len(labels) - len(vals))
-            elif len(vals) > len(labels):
-                vals = vals[: len(labels)]
-
-            label_full = flat_friendly_names.get(
-                key, key.replace("_", " ").capitalize()
-            )
-            label = textwrap.fill(label_full, width=22)
+        for idx, (key, label) in enumerate(zip(series_keys, series_labels)):
+            # NaN deja el hueco en la línea, igual que None
+            vals = _series_values(chart_info, key, len(labels), np.nan)
             color = palette[idx % len(palette)]
-            plt.plot(x, vals, label=label, marker="o", color=color)
+            ax.plot(x, vals, label=label, marker="o", color=color)
 
-        plt.xticks(x, labels, rotation=45, fontsize=16)
-        plt.grid(axis="y", linestyle="-", color="#dcdcdc", linewidth=0.8)
-        plt.legend(loc="best", fontsize=18)
+        ax.set_xticks(x)
+        ax.set_xticklabels(labels, rotation=45, fontsize=16)
+        ax.grid(axis="y", linestyle="-", color="#dcdcdc", linewidth=0.8)
+        ax.legend(loc="best", fontsize=18)
 
     try:
-        plt.gca().yaxis.set_major_formatter(
-            mtick.FuncFormatter(lambda x, pos: f"{int(x):,}")
-        )
+        ax.yaxis.set_major_formatter(mtick.FuncFormatter(lambda x, pos: f"{int(x):,}"))
     except Exception:
         pass
 
-    plt.tight_layout(rect=[0, 0.03, 0.95, 0.97])
-    plt.savefig(output_file, dpi=150, transparent=True)
-    plt.close()
+    fig.tight_layout(rect=[0, 0.03, 0.95, 0.97])
+    fig.savefig(output, format="png", dpi=150, transparent=True)
+
+
+def _render_chart_png(chart_info, flat_friendly_names):
+    # Corre en un hilo (asyncio.to_thread) y devuelve el PNG como bytes, sin
+    # pasar por archivos temporales. Las barras se dibujan directo con Pillow,
+    # que libera el GIL; el resto de los tipos (y barras sin series) con
+    # matplotlib, con una figura por hilo.
+    buf = BytesIO()
+    series_keys = _series_keys(chart_info)
+    if chart_info.get("type") == "bar" and series_keys:
+        labels = chart_info.get("labels", [])
+        series = {}
+        for key in series_keys:
+            vals = _series_values(chart_info, key, len(labels), 0)
+            label_full = flat_friendly_names.get(
+                key, key.replace("_", " ").capitalize()
+            )
+            series[_wrap_label(label_full)] = vals
+        title = chart_info.get("title") or chart_info.get("titulo") or ""
+        render_bar_chart(labels, series, CHART_PALETTE, title, buf)
+    else:
+        create_matplotlib_chart(chart_info, flat_friendly_names, buf)
+    return buf.getvalue()
 
 
-def add_charts(slide, charts, friendly_names, replacements_chart):
+async def add_charts(slide, charts, flat_friendly_names, replacements_chart):
     to_sort = [s for s in slide.shapes if s.name in replacements_chart]
     chart_placeholders = sorted(to_sort, key=lambda s: s.name)
 
+    # Todos los gráficos de la diapositiva se renderizan en paralelo...
+    placeholders = []
+    renders = []
     for i, (name, chart_info) in enumerate(charts.items()):
         if i >= len(chart_placeholders):
             break
-        placeholder = chart_placeholders[i]
         if not chart_info.get("title") and not chart_info.get("titulo") and name:
             chart_info["title"] = name.replace("_", " ").capitalize()
 
-        fn = f"/tmp/{name}_{uuid.uuid4().hex}.png"
-        create_matplotlib_chart(chart_info, friendly_names, fn)
-        insert_image_scaled_by_width(slide, placeholder, fn)
+        placeholders.append(chart_placeholders[i])
+        renders.append(
+            asyncio.to_thread(_render_chart_png, chart_info, flat_friendly_names)
+        )
+
+    # ...y se insertan en orden (python-pptx no es thread-safe)
+    for placeholder, png in zip(placeholders, await asyncio.gather(*renders)):
+        insert_image_scaled_by_width(slide, placeholder, BytesIO(png))
+
+
+def _to_int(val):
+    """Convierte un valor de la planilla a int; lo que no sea numérico cuenta como 0."""
+    if type(val) is int:
+        return val
+    if type(val) is float and math.isfinite(val):
+        return int(val)
+    try:
+        return int(float(val))
+    except (ValueError, TypeError, OverflowError):
+        return 0
+
+
+# Desde 2**53 float64 ya no representa todos los enteros (y desde 2**63 no
+# entran en int64): esas columnas se convierten celda por celda.
+_FLOAT_EXACT_MAX = 2**53
+
+
+def _to_int_column(raw):
+    """
+    Versión vectorizada de _to_int para una columna completa: NumPy convierte
+    números y cadenas numéricas en C; None y valores no finitos cuentan como 0.
+    Si alguna celda no es numérica, es una lista (NumPy la expandiría a otra
+    dimensión) o es demasiado grande, se cae al camino celda por celda.
+    """
+    try:
+        column = np.asarray(raw, dtype=np.float64)
+    except (ValueError, TypeError):
+        return _to_int_cells(raw)
+    if column.shape != (len(raw),):
+        return _to_int_cells(raw)
+    column[~np.isfinite(column)] = 0
+    if np.abs(column).max(initial=0) >= _FLOAT_EXACT_MAX:
+        return _to_int_cells(raw)
+    return column.astype(np.int64)
+
+
+def _to_int_cells(raw):
+    """_to_int celda por celda; si algún valor no entra en int64 queda como int de Python."""
+    cells = [_to_int(v) for v in raw]
+    try:
+        return np.array(cells, dtype=np.int64)
+    except OverflowError:
+        return np.array(cells, dtype=object)
 
 
-def chart_builder(values, name, build, kpis):
-    total = 0
-    for v in values:
-        count = sum(values[v])
-        total += count
+def chart_builder(values, totals, series, name, build, kpis):
+    """
+    `values` es la matriz (semanas × series) del gráfico, `totals` su suma por
+    columna y `series` los nombres de las columnas.
+    """
+    for serie, count in zip(series, totals.tolist()):
         if count > 0:
-            kpis[v] = count
+            kpis[serie] = count
 
-    if total > 0:
+    if totals.sum() > 0:
         build["charts"][name] = {
             "type": "bar",
             "labels": ["Semana 1", "Semana 2", "Semana 3", "Semana 4"],
-            **values,
+            **dict(zip(series, values.T.tolist())),
         }
 
 
@@ -283,17 +664,23 @@ def build_slide_structure(product, product_name, chart_definitions, pointer_resu
         "kpis": "",
         "charts": {},
     }
-    chart_data = {
-        chart_name: {serie: [] for serie in series}
-        for chart_name, series in chart_definitions.items()
-    }
     all_series = {
         serie: json_key
         for series in chart_definitions.values()
         for serie, json_key in series.items()
     }
+    # Columnas de la matriz: cada json_key distinta de todos los gráficos
+    json_keys = list(
+        dict.fromkeys(
+            json_key
+            for series in chart_definitions.values()
+            for json_key in series.values()
+        )
+    )
+    col_index = {json_key: j for j, json_key in enumerate(json_keys)}
     kpis = {}
 
+    semanas = []
     for semana in product:
         semana_key = semana.get("Semana", "").strip()
         if semana_key in slide_info:
@@ -302,21 +689,37 @@ def build_slide_structure(product, product_name, chart_definitions, pointer_resu
             if semana_key == "sugerencia_version":
                 break
         else:
-            for chart_name, series_def in chart_definitions.items():
-                for serie_name, json_key in series_def.items():
-                    val = semana.get(json_key, 0)
-                    try:
-                        val = int(float(val))
-                    except (ValueError, TypeError):
-                        val = 0
-                    chart_data[chart_name][serie_name].append(val)
-
-    for chart_name, data in chart_data.items():
-        chart_builder(data, chart_name, build, kpis)
+            semanas.append(semana)
+
+    # Una matriz (semanas × json_keys) en orden Fortran: cada columna es
+    # contigua (SoA) y se llena de una vez. Una sola suma por columna;
+    # cada gráfico toma sus columnas.
+    n_semanas = len(semanas)
+    columns = [
+        _to_int_column([semana.get(json_key, 0) for semana in semanas])
+        for json_key in json_keys
+    ]
+    # Con enteros fuera de int64 la matriz queda de ints de Python (exactos)
+    dtype = object if any(c.dtype == object for c in columns) else np.int64
+    values = np.empty((n_semanas, len(json_keys)), dtype=dtype, order="F")
+    for j, column in enumerate(columns):
+        values[:, j] = column
+    totals = values.sum(axis=0)
+
+    for chart_name, series_def in chart_definitions.items():
+        cols = [col_index[json_key] for json_key in series_def.values()]
+        chart_builder(
+            values[:, cols],
+            totals[cols],
+            list(series_def),
+            chart_name,
+            build,
+            kpis,
+        )
 
-    for serie, total in kpis.items():
-        nombre_amigable = all_series.get(serie, serie)
-        build["kpis"] += f"{nombre_amigable}: {total}\n"
+    build["kpis"] = "".join(
+        f"{all_series.get(serie, serie)}: {total}\n" for serie, total in kpis.items()
+    )
 
     return build
 
@@ -325,8 +728,8 @@ def build_slide_structure(product, product_name, chart_definitions, pointer_resu
 # GENERADORES
 # --------------------------------------------------------------
 # PORTADA
-def generar_portada(data, logo_stream):
-    prs = Presentation(f"{DATA_DIR}/plantillas/plantilla_portada.pptx")
+def generar_portada(data, logo_bytes, work_dir):
+    prs = Presentation(BytesIO(_template_bytes("plantilla_portada.pptx")))
     slide = prs.slides[0]
 
     replacements = {
@@ -340,15 +743,15 @@ def generar_portada(data, logo_stream):
     replace_placeholders(slide, replacements)
 
     # Busca un placeholder de tipo imagen (18) para el logo.
-    _insert_logo_with_scaling(slide, logo_stream)
+    _insert_logo_with_scaling(slide, logo_bytes)
 
-    output = f"{DATA_DIR}/pptx-parts/portada.pptx"
+    output = f"{work_dir}/portada.pptx"
     prs.save(output)
     return output
 
 
 # CONTENIDO
-def generar_contenido(data, logo_stream):
+async def generar_contenido(data, logo_bytes, work_dir):
     slides_data = data.get("slides", [])
     generated_files = []
 
@@ -356,7 +759,7 @@ def generar_contenido(data, logo_stream):
 
     for i, slide_item in enumerate(slides_data):
         template_file = slide_item.get("file_slide", "plantilla_contenido.pptx")
-        prs = Presentation(f"{DATA_DIR}/plantillas/{template_file}")
+        prs = Presentation(BytesIO(_template_bytes(template_file)))
         slide = prs.slides[0]  # Asumimos que la plantilla tiene una sola diapositiva
 
         slide_content = slide_item.get("slide", {})
@@ -365,10 +768,7 @@ def generar_contenido(data, logo_stream):
         product_type = slide_item.get("type")
         friendly_names = {}
         try:
-            with open(
-                f"{DATA_DIR}/charts/chart_{product_type}.json", "r", encoding="utf-8"
-            ) as f:
-                friendly_names = json.load(f)
+            friendly_names = _load_friendly_names(product_type)
         except FileNotFoundError:
             log(
                 f"⚠️  No se encontró el archivo de configuración de gráficos: chart_{product_type}.json"
@@ -398,20 +798,20 @@ def generar_contenido(data, logo_stream):
         # Insertar gráficos
         charts = slide_content.get("charts", {})
         if charts:
-            add_charts(slide, charts, friendly_names, replacements_chart)
+            await add_charts(slide, charts, friendly_names, replacements_chart)
 
-        _insert_logo_with_scaling(slide, logo_stream)
+        _insert_logo_with_scaling(slide, logo_bytes)
 
-        output_path = f"{DATA_DIR}/pptx-parts/contenido_{product_type}.pptx"
+        output_path = f"{work_dir}/contenido_{product_type}.pptx"
         prs.save(output_path)
         generated_files.append(output_path)
     return generated_files
 
 
 # CIERRE
-def generar_cierre(data, logo_stream):
+def generar_cierre(data, logo_bytes, work_dir):
     cierre = data["despedida"]
-    prs = Presentation(f"{DATA_DIR}/plantillas/plantilla_cierre.pptx")
+    prs = Presentation(BytesIO(_template_bytes("plantilla_cierre.pptx")))
     slide = prs.slides[0]
 
     replacements = {
@@ -422,57 +822,242 @@ def generar_cierre(data, logo_stream):
 
     replace_placeholders(slide, replacements)
 
-    _insert_logo_with_scaling(slide, logo_stream)
+    _insert_logo_with_scaling(slide, logo_bytes)
 
-    output = f"{DATA_DIR}/pptx-parts/cierre.pptx"
+    output = f"{work_dir}/cierre.pptx"
     prs.save(output)
     return output
 
 
-def convert_to_pdf(pptx_file):
-    output_dir = f"{DATA_DIR}/pdf-parts"
-    os.makedirs(output_dir, exist_ok=True)
+# --------------------------------------------------------------
+# LIBREOFFICE (UNO)
+# --------------------------------------------------------------
+def start_lo_daemon(timeout=30):
+    """
+    Arranca un único soffice escuchando por socket y se conecta a él por UNO,
+    así cada conversión evita el arranque en frío de LibreOffice.
+    Sin python3-uno, o si no logra conectarse, se sigue usando la CLI.
+    Devuelve True si quedó conectado.
+    """
+    global lo_daemon, lo_desktop
+    if uno is None:
+        log("ℹ️ python3-uno no disponible, se usa la CLI de LibreOffice.")
+        return False
+
+    try:
+        lo_daemon = subprocess.Popen(
+            [
+                "soffice",
+                "--headless",
+                "--invisible",
+                "--nologo",
+                "--norestore",
+                f"--accept={LO_UNO_ACCEPT}",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    except OSError as e:
+        log(f"⚠️ No se pudo iniciar soffice ({e}), se usa la CLI.")
+        return False
+
+    local_ctx = uno.getComponentContext()
+    resolver = local_ctx.ServiceManager.createInstanceWithContext(
+        "com.sun.star.bridge.UnoUrlResolver", local_ctx
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            ctx = resolver.resolve(LO_UNO_CONNECTION)
+            lo_desktop = ctx.ServiceManager.createInstanceWithContext(
+                "com.sun.star.frame.Desktop", ctx
+            )
+            log("✅ LibreOffice UNO listo.")
+            return True
+        except Exception:
+            time.sleep(0.25)
+
+    log("⚠️ No se pudo conectar a LibreOffice por UNO, se usa la CLI.")
+    stop_lo_daemon()
+    return False
+
+
+async def warm_lo_profiles():
+    """
+    Sin UNO, inicializa los perfiles de la CLI para que la primera conversión
+    de cada uno no pague la creación del UserInstallation. Corre en segundo
+    plano y de a un soffice por vez: no demora el arranque (liveness probe)
+    ni levanta varios LibreOffice juntos.
+    """
+    global lo_warmup
+    if lo_desktop is None:
+        lo_warmup = asyncio.create_task(_warm_lo_profiles())
+
+
+async def _warm_lo_profiles():
+    for _ in LO_PROFILE_DIRS:
+        # El perfil se toma de la cola: ninguna conversión lo usa mientras tanto
+        profile = await LO_PROFILES.get()
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                "libreoffice",
+                f"-env:UserInstallation=file://{profile}",
+                "--headless",
+                "--terminate_after_init",
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            await proc.wait()
+        except OSError as e:
+            log(f"⚠️ No se pudo inicializar el perfil {profile}: {e}")
+        finally:
+            LO_PROFILES.put_nowait(profile)
+
+
+def stop_lo_daemon():
+    global lo_daemon, lo_desktop
+    lo_desktop = None
+    if lo_daemon is not None:
+        lo_daemon.terminate()
+        try:
+            lo_daemon.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            lo_daemon.kill()
+            lo_daemon.wait()
+        lo_daemon = None
+
+
+def _restart_lo_daemon():
+    global lo_failed
+    stop_lo_daemon()
+    lo_failed = not start_lo_daemon()
+
+
+def _schedule_lo_restart():
+    """
+    Da de baja el soffice de UNO (las conversiones pasan a la CLI) y lo
+    reinicia en segundo plano; una sola vez aunque fallen varias a la vez.
+    """
+    global lo_desktop, lo_restart
+    lo_desktop = None
+    if lo_restart is None or lo_restart.done():
+        lo_restart = asyncio.create_task(asyncio.to_thread(_restart_lo_daemon))
+
+
+def _uno_props(**kwargs):
+    return tuple(PropertyValue(Name=k, Value=v) for k, v in kwargs.items())
+
+
+def _convert_with_uno(pptx_file, pdf_file):
+    doc = lo_desktop.loadComponentFromURL(
+        uno.systemPathToFileUrl(os.path.abspath(pptx_file)),
+        "_blank",
+        0,
+        _uno_props(Hidden=True),
+    )
+    try:
+        doc.storeToURL(
+            uno.systemPathToFileUrl(os.path.abspath(pdf_file)),
+            _uno_props(FilterName="impress_pdf_Export"),
+        )
+    finally:
+        doc.close(True)
+
+
+async def convert_to_pdf(pptx_file):
+    # El PDF queda junto al pptx, en el directorio de trabajo del request
+    output_dir = os.path.dirname(pptx_file)
     base_name = os.path.basename(pptx_file).replace(".pptx", ".pdf")
     pdf_file = os.path.join(output_dir, base_name)
 
-    # Ejecución local de LibreOffice (ya estamos en el contenedor correcto)
-    user_inst = f"-env:UserInstallation=file:///tmp/lo_{uuid.uuid4()}"
-    cmd = [
-        "libreoffice",
-        user_inst,
-        "--headless",
-        "--convert-to",
-        "pdf",
-        pptx_file,
-        "--outdir",
-        output_dir,
-    ]
-
+    if lo_desktop is not None:
+        # Un solo soffice: las conversiones por UNO se serializan y corren
+        # en un hilo para no bloquear el event loop.
+        async with LO_UNO_LOCK:
+            # Puede haberse caído mientras se esperaba el lock
+            if lo_desktop is not None:
+                try:
+                    await asyncio.to_thread(_convert_with_uno, pptx_file, pdf_file)
+                    return pdf_file
+                except (DisposedException, UnoRuntimeException) as e:
+                    # Se cayó soffice o el bridge: se reinicia y este pptx
+                    # se convierte por la CLI
+                    log(f"⚠️ LibreOffice (UNO) no responde, se reinicia: {e}")
+                    _schedule_lo_restart()
+                except Exception as e:
+                    log(f"⚠️ Error en LibreOffice (UNO): {e}")
+                    raise HTTPException(
+                        status_code=500, detail=f"LibreOffice error: {e}"
+                    )
+
+    # Ejecución local de LibreOffice (ya estamos en el contenedor correcto).
+    # Cada conversión usa un perfil libre del pool, así que varias pueden
+    # correr en paralelo sin bloquear el event loop.
+    profile = await LO_PROFILES.get()
     try:
-        subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-    except subprocess.CalledProcessError as e:
-        log(f"⚠️ Error en LibreOffice: {e.stderr.decode('utf-8', errors='replace')}")
+        cmd = [
+            "libreoffice",
+            f"-env:UserInstallation=file://{profile}",
+            "--headless",
+            "--convert-to",
+            "pdf",
+            pptx_file,
+            "--outdir",
+            output_dir,
+        ]
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        try:
+            _, stderr = await proc.communicate()
+        except asyncio.CancelledError:
+            # No dejar un soffice escribiendo en un directorio que se va a borrar
+            proc.kill()
+            await proc.wait()
+            raise
+    finally:
+        LO_PROFILES.put_nowait(profile)
+
+    if proc.returncode != 0:
+        log(f"⚠️ Error en LibreOffice: {stderr.decode('utf-8', errors='replace')}")
         raise HTTPException(
-            status_code=500, detail=f"LibreOffice error: {e.stderr.decode()}"
+            status_code=500, detail=f"LibreOffice error: {stderr.decode()}"
         )
 
     return pdf_file
 
 
-def unir_pdfs(pdf_paths, empresa, type="", split=0):
-    writer = PdfWriter()
-    for pdf_path in pdf_paths:
-        reader = PdfReader(pdf_path)
-        for page in reader.pages:
-            writer.add_page(page)
+async def convert_all_to_pdf(pptx_files):
+    """
+    Convierte los pptx en paralelo y devuelve los PDF en el mismo orden.
+    Si una conversión falla se espera a que terminen las demás antes de
+    propagar el error: el directorio de trabajo no se borra con soffice
+    todavía escribiendo en él.
+    """
+    results = await asyncio.gather(
+        *(convert_to_pdf(f) for f in pptx_files), return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
 
+
+def unir_pdfs(pdf_paths, empresa, type="", split=0):
     output_dir = f"{DATA_DIR}/generados"
     os.makedirs(output_dir, exist_ok=True)
     out_name = f"informe_{empresa}{'.' + type if split == 1 else ''}.pdf"
     out_path = f"{output_dir}/{out_name}"
 
-    with open(out_path, "wb") as f:
-        writer.write(f)
+    # Cada elemento puede ser una ruta o un pikepdf.Pdf ya abierto (reutilizable).
+    # libqpdf copia las páginas en C++ y escribe el resultado en una sola pasada;
+    # los PDF de origen deben seguir abiertos hasta guardar.
+    with ExitStack() as stack, pikepdf.Pdf.new() as merged:
+        for src in pdf_paths:
+            if not isinstance(src, pikepdf.Pdf):
+                src = stack.enter_context(pikepdf.open(src))
+            merged.pages.extend(src.pages)
+        merged.save(out_path)
     return out_path
 
 
@@ -482,55 +1067,79 @@ def unir_pdfs(pdf_paths, empresa, type="", split=0):
 @app.post("/generate")
 async def generate_report(request: Request):
     try:
-        body = await request.json()
+        body = json_loads(await request.body())
         data = body.get("data", {})
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid JSON")
 
     split = data.get("split", 0)
-    logo_stream = get_logo_from_base64(data.get("logo_base64"))
+    # El logo se decodifica y se ajusta una vez para todas las diapositivas
+    logo_bytes = prepare_logo(get_logo_from_base64(data.get("logo_base64")))
 
     empresa = data.get("logo")[:-4].lower() if data.get("logo") else ""
 
-    portada = None
-    cierre = None
-    if data["save"]:
-        portada = generar_portada(data, logo_stream)
-        cierre = generar_cierre(data, logo_stream)
-    contenido_files = generar_contenido(data, logo_stream)
-    types = [slide.get("type", "") for slide in data.get("slides", [])]
-
-    # Pre-convert common parts to avoid redundant processing
-    portada_pdf = convert_to_pdf(portada) if (data["save"] and portada) else None
-    cierre_pdf = convert_to_pdf(cierre) if (data["save"] and cierre) else None
-
-    informe_names = []
-    if split == 0:
-        pdf_files_to_merge = []
-        if portada_pdf:
-            pdf_files_to_merge.append(portada_pdf)
-
-        pdf_files_to_merge.extend([convert_to_pdf(f) for f in contenido_files])
-
-        if cierre_pdf:
-            pdf_files_to_merge.append(cierre_pdf)
+    # Cada request trabaja en su propio directorio: dos requests concurrentes
+    # no se pisan los pptx ni los PDF intermedios mientras esperan a LibreOffice.
+    with tempfile.TemporaryDirectory(prefix="informe_") as work_dir:
+        portada = None
+        cierre = None
+        if data["save"]:
+            portada = generar_portada(data, logo_bytes, work_dir)
+            cierre = generar_cierre(data, logo_bytes, work_dir)
+        contenido_files = await generar_contenido(data, logo_bytes, work_dir)
+        types = [slide.get("type", "") for slide in data.get("slides", [])]
+
+        # Todas las conversiones (portada, contenidos y cierre) en paralelo
+        # (dict.fromkeys: un mismo pptx no se convierte dos veces a la vez)
+        pptx_files = list(
+            dict.fromkeys(f for f in (portada, *contenido_files, cierre) if f)
+        )
+        pdf_files = await convert_all_to_pdf(pptx_files)
+        pdf_by_pptx = dict(zip(pptx_files, pdf_files))
 
-        informe_names.append(unir_pdfs(pdf_files_to_merge, empresa))
-    else:
-        for idx, content_pptx in enumerate(contenido_files):
+        portada_pdf = pdf_by_pptx.get(portada)
+        cierre_pdf = pdf_by_pptx.get(cierre)
 
+        informe_names = []
+        if split == 0:
             pdf_files_to_merge = []
             if portada_pdf:
                 pdf_files_to_merge.append(portada_pdf)
 
-            pdf_files_to_merge.append(convert_to_pdf(content_pptx))
+            pdf_files_to_merge.extend(pdf_by_pptx[f] for f in contenido_files)
 
             if cierre_pdf:
                 pdf_files_to_merge.append(cierre_pdf)
 
-            informe_names.append(
-                unir_pdfs(pdf_files_to_merge, empresa, types[idx], split)
-            )
+            informe_names.append(unir_pdfs(pdf_files_to_merge, empresa))
+        else:
+            # Portada y cierre se repiten en cada informe: se abren una sola vez
+            with ExitStack() as stack:
+                portada_doc = (
+                    stack.enter_context(pikepdf.open(portada_pdf))
+                    if portada_pdf
+                    else None
+                )
+                cierre_doc = (
+                    stack.enter_context(pikepdf.open(cierre_pdf))
+                    if cierre_pdf
+                    else None
+                )
+
+                for idx, content_pptx in enumerate(contenido_files):
+
+                    pdf_files_to_merge = []
+                    if portada_doc:
+                        pdf_files_to_merge.append(portada_doc)
+
+                    pdf_files_to_merge.append(pdf_by_pptx[content_pptx])
+
+                    if cierre_doc:
+                        pdf_files_to_merge.append(cierre_doc)
+
+                    informe_names.append(
+                        unir_pdfs(pdf_files_to_merge, empresa, types[idx], split)
+                    )
 
     return {"file_names": informe_names}
 
@@ -538,7 +1147,7 @@ async def generate_report(request: Request):
 @app.post("/build-structure")
 async def build_structure(request: Request):
     try:
-        body = await request.json()
+        body = json_loads(await request.body())
         data = body.get("data", {})
         main = data.get("main", {})
         products = data.get("products", [])
@@ -574,12 +1183,10 @@ async def build_structure(request: Request):
             main["fecha_portada"] = "Fecha no válida"
 
         # Agrupar productos
-        parse_products = {}
+        parse_products = defaultdict(list)
         actual_product = ""
         for product in products:
             actual_product = product.get("product", actual_product)
-            if actual_product not in parse_products:
-                parse_products[actual_product] = []
             parse_products[actual_product].append(product)
 
         # Construir slides
@@ -603,10 +1210,7 @@ async def build_structure(request: Request):
 
             chart_def = {}
             try:
-                with open(
-                    f"{DATA_DIR}/charts/chart_{product_key}.json", "r", encoding="utf-8"
-                ) as f:
-                    chart_def = json.load(f)
+                chart_def = _load_chart_config(product_key)
             except FileNotFoundError:
                 pass
 
@@ -634,34 +1238,35 @@ async def build_structure(request: Request):
 @app.post("/generate-n-emp")
 async def generate_pdf_n_emp(request: Request):
     try:
-        body = await request.json()
+        body = json_loads(await request.body())
         data = body.get("data", {})
         main_data = data.get("main", {})
         emp_codes = data.get("emp_codes", [])
         logos_base64_list = data.get("logos_base64", [])
 
-        logo_stream = create_composite_logo_from_base64_list(logos_base64_list)
+        logo_bytes = create_composite_logo_from_base64_list(logos_base64_list)
         empresa = "-".join(emp_codes).lower()
 
-        # Generar Portada
-        portada_path = generar_portada(main_data, logo_stream)
-        portada_pdf = convert_to_pdf(portada_path)
-
-        # Generar Cierre
-        cierre_path = generar_cierre(main_data, logo_stream)
-        cierre_pdf = convert_to_pdf(cierre_path)
+        # Directorio de trabajo propio del request (ver generate_report)
+        with tempfile.TemporaryDirectory(prefix="informe_") as work_dir:
+            # Generar Portada y Cierre
+            portada_path = generar_portada(main_data, logo_bytes, work_dir)
+            cierre_path = generar_cierre(main_data, logo_bytes, work_dir)
+            portada_pdf, cierre_pdf = await convert_all_to_pdf(
+                [portada_path, cierre_path]
+            )
 
-        # Unir todo
-        pdf_files_to_merge = [portada_pdf]
-        pdf_files_to_merge.extend(
-            [
-                os.path.join(DATA_DIR, "generados", f"informe_{f.lower()}.pdf")
-                for f in emp_codes
-            ]
-        )
-        pdf_files_to_merge.append(cierre_pdf)
+            # Unir todo
+            pdf_files_to_merge = [portada_pdf]
+            pdf_files_to_merge.extend(
+                [
+                    os.path.join(DATA_DIR, "generados", f"informe_{f.lower()}.pdf")
+                    for f in emp_codes
+                ]
+            )
+            pdf_files_to_merge.append(cierre_pdf)
 
-        final_pdf = unir_pdfs(pdf_files_to_merge, empresa)
+            final_pdf = unir_pdfs(pdf_files_to_merge, empresa)
         return {"file_name": os.path.basename(f"informe_{empresa}")}
     except Exception as e:
         raise HTTPException(
@@ -670,5 +1275,14 @@ async def generate_pdf_n_emp(request: Request):
 
 
 @app.get("/health")
-def health():
-    return {"status": "ok"}
+async def health():
+    if lo_failed:
+        # El soffice de UNO se cayó y no volvió: el liveness probe reinicia el pod
+        raise HTTPException(status_code=503, detail="LibreOffice (UNO) caído")
+    if lo_desktop is not None:
+        libreoffice = "uno"
+    elif lo_restart is not None and not lo_restart.done():
+        libreoffice = "reiniciando"
+    else:
+        libreoffice = "cli"
+    return {"status": "ok", "libreoffice": libreoffice}